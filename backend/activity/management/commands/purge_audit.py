@@ -0,0 +1,43 @@
+"""Retention command for the audit log."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from activity.models import AuditLog
+from activity.partitions import drop_partitions_before
+
+
+class Command(BaseCommand):
+    help = "Elimina registros de bitacora anteriores a la cantidad de dias indicada."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=180, help="Dias de bitacora a conservar.")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Registros eliminados por lote.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        chunk_size = options["chunk_size"]
+
+        dropped = drop_partitions_before(cutoff.date())
+        for name in dropped:
+            self.stdout.write(f"Particion {name} eliminada.")
+
+        deleted = 0
+        batch: list = []
+        pks = AuditLog.objects.filter(created_at__lt=cutoff).values_list("pk", flat=True)
+        for pk in pks.iterator(chunk_size=chunk_size):
+            batch.append(pk)
+            if len(batch) >= chunk_size:
+                deleted += self._delete(batch)
+                batch = []
+        if batch:
+            deleted += self._delete(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"{deleted} registros de bitacora eliminados."))
+
+    def _delete(self, pks: list) -> int:
+        deleted, _ = AuditLog.objects.filter(pk__in=pks).delete()
+        return deleted
@@ -6,7 +6,14 @@ from typing import Callable
 from django.http import HttpRequest, HttpResponse
 
 from .models import AuditLog
-from .utils import record_event
+from .utils import audit_context, record_event
+
+
+def _summarize_traceback(exc: BaseException) -> str:
+    if exc.__traceback__ is None:
+        return exc.__class__.__name__
+    frames = traceback.extract_tb(exc.__traceback__)[-10:]
+    return "\n".join(f"{frame.filename}:{frame.lineno} {frame.name}" for frame in frames)
 
 
 class AuditLogMiddleware:
@@ -16,6 +23,7 @@ class AuditLogMiddleware:
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
+        request._audit_ctx = audit_context(request)
         try:
             response = self.get_response(request)
         except Exception as exc:
@@ -27,7 +35,7 @@ class AuditLogMiddleware:
             metadata = {
                 "path": request.path,
                 "method": request.method,
-                "traceback": "\n".join(traceback.format_exc().splitlines()[-10:]),
+                "traceback": _summarize_traceback(exc),
             }
 
             record_event(
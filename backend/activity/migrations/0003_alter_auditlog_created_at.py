@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-15 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0002_rename_activity_a_event_t_7274a4_idx_activity_au_event_t_9ed639_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.25 on 2026-10-15 09:40
+
+import msgpack
+from django.db import migrations, models
+
+
+def pack_metadata(apps, schema_editor):
+    AuditLog = apps.get_model("activity", "AuditLog")
+    batch = []
+    for log in AuditLog.objects.only("id", "metadata").iterator(chunk_size=2000):
+        if not log.metadata:
+            continue
+        log.metadata_blob = msgpack.packb(log.metadata, use_bin_type=True)
+        batch.append(log)
+        if len(batch) >= 2000:
+            AuditLog.objects.bulk_update(batch, ["metadata_blob"])
+            batch = []
+    if batch:
+        AuditLog.objects.bulk_update(batch, ["metadata_blob"])
+
+
+def unpack_metadata(apps, schema_editor):
+    AuditLog = apps.get_model("activity", "AuditLog")
+    batch = []
+    for log in AuditLog.objects.only("id", "metadata_blob").iterator(chunk_size=2000):
+        if not log.metadata_blob:
+            continue
+        log.metadata = msgpack.unpackb(log.metadata_blob, raw=False)
+        batch.append(log)
+        if len(batch) >= 2000:
+            AuditLog.objects.bulk_update(batch, ["metadata"])
+            batch = []
+    if batch:
+        AuditLog.objects.bulk_update(batch, ["metadata"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0003_alter_auditlog_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='metadata_blob',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(pack_metadata, unpack_metadata),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='metadata',
+        ),
+    ]
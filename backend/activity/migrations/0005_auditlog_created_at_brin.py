@@ -0,0 +1,46 @@
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+def create_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS activity_au_created_fcd391_idx")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS activity_created_brin ON activity_auditlog "
+        "USING brin (created_at) WITH (pages_per_range = 32)"
+    )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS activity_created_brin")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS activity_au_created_fcd391_idx ON activity_auditlog (created_at)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0004_auditlog_metadata_blob'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='auditlog',
+                    name='activity_au_created_fcd391_idx',
+                ),
+                migrations.AddIndex(
+                    model_name='auditlog',
+                    index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='activity_created_brin', pages_per_range=32),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_brin_index, drop_brin_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,80 @@
+"""Convert activity_auditlog into a table partitioned by month on created_at.
+
+PostgreSQL requires the partition key in the primary key, so the table-level
+key becomes (id, created_at); Django keeps treating ``id`` as the primary key.
+"""
+from django.db import migrations
+from django.utils import timezone
+
+from activity.partitions import AUDIT_TABLE, add_months, create_partition, is_partitioned
+
+LEGACY_TABLE = f"{AUDIT_TABLE}_legacy"
+
+
+def _index_definitions(cursor, table: str) -> list[str]:
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s",
+        [table, "%_pkey"],
+    )
+    return [row[0].replace(f".{table} ", f".{AUDIT_TABLE} ") for row in cursor.fetchall()]
+
+
+def _rebuild_table(cursor, partitioned: bool) -> None:
+    cursor.execute(f"ALTER TABLE {AUDIT_TABLE} RENAME TO {LEGACY_TABLE}")
+    cursor.execute(f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT {AUDIT_TABLE}_pkey TO {LEGACY_TABLE}_pkey")
+    indexes = _index_definitions(cursor, LEGACY_TABLE)
+
+    partition_clause = " PARTITION BY RANGE (created_at)" if partitioned else ""
+    primary_key = "id, created_at" if partitioned else "id"
+    cursor.execute(
+        f"CREATE TABLE {AUDIT_TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        f"{partition_clause}"
+    )
+    cursor.execute(f"ALTER TABLE {AUDIT_TABLE} ADD CONSTRAINT {AUDIT_TABLE}_pkey PRIMARY KEY ({primary_key})")
+
+    if partitioned:
+        cursor.execute(f"CREATE TABLE {AUDIT_TABLE}_default PARTITION OF {AUDIT_TABLE} DEFAULT")
+        cursor.execute(f"SELECT MIN(created_at) FROM {LEGACY_TABLE}")
+        oldest = cursor.fetchone()[0]
+        current = timezone.now().date().replace(day=1)
+        month = oldest.date().replace(day=1) if oldest else current
+        while month <= add_months(current, 2):
+            create_partition(cursor, month)
+            month = add_months(month, 1)
+
+    cursor.execute(f"INSERT INTO {AUDIT_TABLE} SELECT * FROM {LEGACY_TABLE}")
+    cursor.execute(f"DROP TABLE {LEGACY_TABLE}")
+    for definition in indexes:
+        cursor.execute(definition)
+    cursor.execute(
+        f"ALTER TABLE {AUDIT_TABLE} ADD CONSTRAINT {AUDIT_TABLE}_actor_id_fk "
+        "FOREIGN KEY (actor_id) REFERENCES authx_user (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            _rebuild_table(cursor, partitioned=True)
+
+
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            _rebuild_table(cursor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0005_auditlog_created_at_brin'),
+        ('authx', '0002_rename_authx_email_user_pu_9acf76_idx_authx_email_user_id_9a2db4_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+EVENT_TYPE_CODES = {
+    "LOGIN": 1,
+    "LOGOUT": 2,
+    "CREATE": 3,
+    "UPDATE": 4,
+    "DELETE": 5,
+    "SYSTEM_ERROR": 6,
+    "ACTION": 7,
+}
+
+
+def fill_event_type_code(apps, schema_editor):
+    AuditLog = apps.get_model("activity", "AuditLog")
+    for event_type, code in EVENT_TYPE_CODES.items():
+        AuditLog.objects.filter(event_type=event_type).update(event_type_code=code)
+
+
+def fill_event_type(apps, schema_editor):
+    AuditLog = apps.get_model("activity", "AuditLog")
+    for event_type, code in EVENT_TYPE_CODES.items():
+        AuditLog.objects.filter(event_type_code=code).update(event_type=event_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0006_partition_auditlog_by_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='event_type_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(fill_event_type_code, fill_event_type),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='event_type_code',
+            field=models.PositiveSmallIntegerField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='activity_au_event_t_9ed639_idx',
+        ),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='event_type',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['event_type_code'], name='activity_event_code_idx'),
+        ),
+    ]
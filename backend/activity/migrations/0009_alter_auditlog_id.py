@@ -0,0 +1,17 @@
+import activity.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0008_auditlog_activity_actor_time_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='id',
+            field=models.UUIDField(default=activity.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
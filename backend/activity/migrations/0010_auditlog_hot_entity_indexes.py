@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0009_alter_auditlog_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(condition=models.Q(('entity_type', 'Usuario')), fields=['-created_at'], name='activity_hot_usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(condition=models.Q(('entity_type', 'Producto')), fields=['-created_at'], name='activity_hot_producto'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(condition=models.Q(('entity_type', 'Cliente')), fields=['-created_at'], name='activity_hot_cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(condition=models.Q(('entity_type', 'Order')), fields=['-created_at'], name='activity_hot_order'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(condition=models.Q(('entity_type', 'Promocion')), fields=['-created_at'], name='activity_hot_promocion'),
+        ),
+    ]
@@ -7,6 +7,11 @@ from .utils import AuditLogViewSetMixin
 class AuditableModelViewSet(AuditLogViewSetMixin, viewsets.ModelViewSet):
     """ModelViewSet que registra eventos CRUD en la bitacora."""
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.audit_entity is None and getattr(cls, "queryset", None) is not None:
+            cls.audit_entity = cls.queryset.model.__name__
+
     def perform_create(self, serializer):
         instance = serializer.save()
         self.log_create(instance)
@@ -1,14 +1,41 @@
 """Models for activity logging."""
 from __future__ import annotations
 
+import os
+import time
 import uuid
+from typing import Any
 
+import msgpack
 from django.conf import settings
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
+from django.utils import timezone
+
+# Entity types that dominate the log; each gets a small partial index for the
+# per-entity timelines shown in the dashboard.
+HOT_AUDIT_ENTITIES = ("Usuario", "Producto", "Cliente", "Order", "Promocion")
+
+
+def uuid7() -> uuid.UUID:
+    """Return a time-ordered UUID (RFC 9562 version 7).
+
+    New keys land on the rightmost leaf of the primary key index instead of
+    random positions, which avoids page splits on this append-only table.
+    """
+
+    value = (time.time_ns() // 1_000_000 & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
 
 
 class AuditLog(models.Model):
-    """Stores audit events (bitacora)."""
+    """Stores audit events (bitacora).
+
+    On PostgreSQL the table is range-partitioned by month on ``created_at``
+    (see ``activity.partitions``), with ``(id, created_at)`` as the table key.
+    """
 
     class EventType(models.TextChoices):
         LOGIN = "LOGIN", "Inicio de sesion"
@@ -19,7 +46,19 @@ class AuditLog(models.Model):
         SYSTEM_ERROR = "SYSTEM_ERROR", "Error del sistema"
         ACTION = "ACTION", "Accion"
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Event types are stored as smallints to keep the column and its index narrow.
+    EVENT_TYPE_CODES = {
+        "LOGIN": 1,
+        "LOGOUT": 2,
+        "CREATE": 3,
+        "UPDATE": 4,
+        "DELETE": 5,
+        "SYSTEM_ERROR": 6,
+        "ACTION": 7,
+    }
+    EVENT_TYPES_BY_CODE = {code: event_type for event_type, code in EVENT_TYPE_CODES.items()}
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     actor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -27,24 +66,51 @@ class AuditLog(models.Model):
         null=True,
         blank=True,
     )
-    event_type = models.CharField(max_length=32, choices=EventType.choices)
+    event_type_code = models.PositiveSmallIntegerField()
     entity_type = models.CharField(max_length=120, blank=True)
     entity_id = models.CharField(max_length=120, blank=True)
     description = models.TextField()
-    metadata = models.JSONField(default=dict, blank=True)
+    metadata_blob = models.BinaryField(blank=True, default=b"")
     request_ip = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=255, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["event_type"]),
+            models.Index(fields=["event_type_code"], name="activity_event_code_idx"),
             models.Index(fields=["entity_type", "entity_id"]),
-            models.Index(fields=["created_at"]),
+            models.Index(fields=["actor", "-created_at"], name="activity_actor_time_idx"),
+            BrinIndex(fields=["created_at"], pages_per_range=32, name="activity_created_brin"),
+            *(
+                models.Index(
+                    fields=["-created_at"],
+                    condition=models.Q(entity_type=entity),
+                    name=f"activity_hot_{entity.lower()}",
+                )
+                for entity in HOT_AUDIT_ENTITIES
+            ),
         ]
         verbose_name = "Registro de bitacora"
         verbose_name_plural = "Registros de bitacora"
 
+    @property
+    def event_type(self) -> str | None:
+        return self.EVENT_TYPES_BY_CODE.get(self.event_type_code)
+
+    @event_type.setter
+    def event_type(self, value: str) -> None:
+        self.event_type_code = self.EVENT_TYPE_CODES[value]
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        if not self.metadata_blob:
+            return {}
+        return msgpack.unpackb(self.metadata_blob, raw=False)
+
+    @metadata.setter
+    def metadata(self, value: dict[str, Any] | None) -> None:
+        self.metadata_blob = msgpack.packb(value, use_bin_type=True) if value else b""
+
     def __str__(self) -> str:
         return f"{self.event_type} - {self.entity_type} - {self.created_at:%Y-%m-%d %H:%M:%S}"
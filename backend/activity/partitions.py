@@ -0,0 +1,131 @@
+"""Helpers for the monthly range partitions of the audit log table (PostgreSQL only)."""
+from __future__ import annotations
+
+from datetime import date
+
+from django.db import connection, transaction
+
+AUDIT_TABLE = "activity_auditlog"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{AUDIT_TABLE}_{month:%Y_%m}"
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [AUDIT_TABLE])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def create_partition(cursor, month: date) -> None:
+    month = month.replace(day=1)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {AUDIT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def _table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def _default_has_rows(cursor, month: date) -> bool:
+    if not _table_exists(cursor, DEFAULT_PARTITION):
+        return False
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)",
+        [month, add_months(month, 1)],
+    )
+    return cursor.fetchone()[0]
+
+
+def _create_partition_from_default(cursor, month: date) -> None:
+    # Rows for a month that had no partition yet landed in DEFAULT, and
+    # PostgreSQL refuses to create a partition whose range DEFAULT already
+    # holds. Detach DEFAULT, create the month, move its rows across and
+    # reattach; DETACH locks the parent, so concurrent inserts just wait.
+    end = add_months(month, 1)
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        create_partition(cursor, month)
+        cursor.execute(
+            f"INSERT INTO {AUDIT_TABLE} SELECT * FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s",
+            [month, end],
+        )
+        cursor.execute(
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s",
+            [month, end],
+        )
+        cursor.execute(f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+
+
+def monthly_partitions(cursor) -> list[tuple[str, date]]:
+    """Return ``(name, month)`` for every monthly partition, oldest first."""
+
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = %s",
+        [AUDIT_TABLE],
+    )
+    partitions = []
+    prefix = f"{AUDIT_TABLE}_"
+    for (name,) in cursor.fetchall():
+        suffix = name[len(prefix):]
+        try:
+            year, month = (int(part) for part in suffix.split("_"))
+        except ValueError:
+            continue
+        partitions.append((name, date(year, month, 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def ensure_partitions(start: date, months_ahead: int = 3) -> int:
+    """Create the missing partitions from ``start`` up to ``months_ahead`` months after it.
+
+    Returns the number of partitions created.
+    """
+
+    if connection.vendor != "postgresql":
+        return 0
+    created = 0
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return 0
+        month = start.replace(day=1)
+        for offset in range(months_ahead + 1):
+            target = add_months(month, offset)
+            if _table_exists(cursor, partition_name(target)):
+                continue
+            if _default_has_rows(cursor, target):
+                _create_partition_from_default(cursor, target)
+            else:
+                create_partition(cursor, target)
+            created += 1
+    return created
+
+
+def drop_partitions_before(cutoff: date) -> list[str]:
+    """Drop every monthly partition that only holds rows older than ``cutoff``."""
+
+    if connection.vendor != "postgresql":
+        return []
+    dropped = []
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return []
+        for name, month in monthly_partitions(cursor):
+            if add_months(month, 1) > cutoff:
+                break
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+            dropped.append(name)
+    return dropped
@@ -1,13 +1,33 @@
 from __future__ import annotations
 
+from typing import Any
+
+import msgpack
 from rest_framework import serializers
 
 from .models import AuditLog
 
+AUDIT_LOG_LIST_VALUES = (
+    "id",
+    "event_type_code",
+    "entity_type",
+    "entity_id",
+    "description",
+    "metadata_blob",
+    "request_ip",
+    "user_agent",
+    "created_at",
+    "actor_id",
+    "actor_email_ann",
+    "actor_full_name",
+)
+
+_DATETIME_FIELD = serializers.DateTimeField()
+
 
 class AuditLogSerializer(serializers.ModelSerializer):
-    actor_email = serializers.EmailField(source="actor.email", read_only=True)
-    actor_name = serializers.SerializerMethodField()
+    actor_email = serializers.CharField(source="actor_email_ann", read_only=True)
+    actor_name = serializers.CharField(source="actor_full_name", read_only=True)
 
     class Meta:
         model = AuditLog
@@ -27,8 +47,22 @@ class AuditLogSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
-    def get_actor_name(self, obj: AuditLog) -> str | None:
-        if not obj.actor:
-            return None
-        full_name = f"{obj.actor.first_name} {obj.actor.last_name}".strip()
-        return full_name or obj.actor.email
+
+def serialize_auditlog_row(row: dict[str, Any]) -> dict[str, Any]:
+    """Build the ``AuditLogSerializer`` representation from a ``.values()`` row."""
+
+    blob = row["metadata_blob"]
+    return {
+        "id": str(row["id"]),
+        "event_type": AuditLog.EVENT_TYPES_BY_CODE.get(row["event_type_code"]),
+        "entity_type": row["entity_type"],
+        "entity_id": row["entity_id"],
+        "description": row["description"],
+        "metadata": msgpack.unpackb(blob, raw=False) if blob else {},
+        "request_ip": row["request_ip"],
+        "user_agent": row["user_agent"],
+        "created_at": _DATETIME_FIELD.to_representation(row["created_at"]),
+        "actor": row["actor_id"],
+        "actor_email": row["actor_email_ann"],
+        "actor_name": row["actor_full_name"],
+    }
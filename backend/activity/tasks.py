@@ -0,0 +1,155 @@
+"""Background tasks for activity logging."""
+from __future__ import annotations
+
+import csv
+import io
+from functools import lru_cache
+from typing import Any
+
+import msgpack
+import redis
+from redis.exceptions import LockError
+from celery import shared_task
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog, uuid7
+from .partitions import ensure_partitions
+
+AUDIT_BATCH_SIZE = getattr(settings, "AUDIT_BATCH_SIZE", 500)
+
+# Events waiting for the next flush live in a Redis list, so they survive a
+# killed worker and any number of audit worker processes can share them.
+AUDIT_BUFFER_KEY = "audit:buffer"
+_FLUSH_LOCK_KEY = "audit:buffer:flush"
+_FLUSH_LOCK_TIMEOUT = 60
+
+_COPY_COLUMNS = (
+    "id",
+    "actor_id",
+    "event_type_code",
+    "entity_type",
+    "entity_id",
+    "description",
+    "metadata_blob",
+    "request_ip",
+    "user_agent",
+    "created_at",
+)
+# Empty unquoted CSV fields are NULL for actor_id/request_ip but must stay ''
+# for the NOT NULL text columns.
+_COPY_SQL = (
+    f"COPY {AuditLog._meta.db_table} ({', '.join(_COPY_COLUMNS)}) FROM STDIN "
+    "WITH (FORMAT csv, FORCE_NOT_NULL (entity_type, entity_id, description, user_agent))"
+)
+
+
+def _build_audit_log(payload: dict[str, Any]) -> AuditLog:
+    data = dict(payload)
+    data["created_at"] = parse_datetime(data["created_at"])
+    return AuditLog(**data)
+
+
+def _copy_audit_logs(payloads: list[dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for payload in payloads:
+        metadata = payload["metadata"]
+        blob = msgpack.packb(metadata, use_bin_type=True) if metadata else b""
+        writer.writerow(
+            (
+                uuid7(),
+                payload["actor_id"] or "",
+                AuditLog.EVENT_TYPE_CODES[payload["event_type"]],
+                payload["entity_type"],
+                payload["entity_id"],
+                payload["description"],
+                "\\x" + blob.hex(),
+                payload["request_ip"] or "",
+                payload["user_agent"],
+                payload["created_at"],
+            )
+        )
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(_COPY_SQL, buffer)
+
+
+@lru_cache(maxsize=1)
+def _buffer_client() -> redis.Redis | None:
+    url = getattr(settings, "AUDIT_BUFFER_REDIS_URL", "")
+    return redis.Redis.from_url(url) if url else None
+
+
+def _write_batch(batch: list[dict[str, Any]]) -> int:
+    if not batch:
+        return 0
+    if connection.vendor == "postgresql":
+        _copy_audit_logs(batch)
+    else:
+        AuditLog.objects.bulk_create(
+            [_build_audit_log(payload) for payload in batch],
+            batch_size=AUDIT_BATCH_SIZE,
+        )
+    return len(batch)
+
+
+def _flush_buffer(client: redis.Redis) -> int:
+    written = 0
+    # The lock keeps two flushes from writing the same range. Rows are only
+    # trimmed after the COPY succeeded, so a crash in between re-writes the
+    # batch (at-least-once) instead of losing it.
+    lock = client.lock(_FLUSH_LOCK_KEY, timeout=_FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        while True:
+            raw = client.lrange(AUDIT_BUFFER_KEY, 0, AUDIT_BATCH_SIZE - 1)
+            if not raw:
+                break
+            _write_batch([msgpack.unpackb(item, raw=False) for item in raw])
+            client.ltrim(AUDIT_BUFFER_KEY, len(raw), -1)
+            written += len(raw)
+            if len(raw) < AUDIT_BATCH_SIZE:
+                break
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired during a slow flush; the next run takes it again.
+            pass
+    return written
+
+
+@shared_task(ignore_result=True)
+def write_audit_log(payload: dict[str, Any]) -> None:
+    """Buffer an audit event built by ``record_event``.
+
+    Without a Redis buffer (local setups) the event is written right away.
+    """
+
+    client = _buffer_client()
+    if client is None or getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False):
+        _write_batch([payload])
+        return
+    if client.rpush(AUDIT_BUFFER_KEY, msgpack.packb(payload, use_bin_type=True)) >= AUDIT_BATCH_SIZE:
+        _flush_buffer(client)
+
+
+@shared_task(ignore_result=True)
+def flush_audit_buffer() -> int:
+    """Write the buffered audit events in batches of ``AUDIT_BATCH_SIZE``."""
+
+    client = _buffer_client()
+    if client is None:
+        return 0
+    return _flush_buffer(client)
+
+
+@shared_task(ignore_result=True)
+def ensure_audit_partitions() -> int:
+    """Create the audit log partitions for the current and next three months."""
+
+    return ensure_partitions(timezone.now().date(), months_ahead=3)
@@ -0,0 +1,168 @@
+"""Activity logging tests."""
+from unittest import mock
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from activity.models import AuditLog
+from activity.tasks import AUDIT_BUFFER_KEY, _flush_buffer, _write_batch, write_audit_log
+from activity.utils import dropped_event_counts, record_event
+
+
+def _payload(**overrides):
+    payload = {
+        "actor_id": None,
+        "event_type": "ACTION",
+        "entity_type": "Producto",
+        "entity_id": "42",
+        "description": "Producto consultado.",
+        "metadata": {"path": "/api/products/", "tags": ["a", "b"]},
+        "request_ip": None,
+        "user_agent": "",
+        "created_at": timezone.now().isoformat(),
+    }
+    payload.update(overrides)
+    return payload
+
+
+class AuditWritePipelineTests(TestCase):
+    def test_metadata_round_trips_through_messagepack(self):
+        log = AuditLog(event_type="ACTION", description="x")
+        log.metadata = {"path": "/", "count": 3}
+        self.assertEqual(msgpack.unpackb(log.metadata_blob, raw=False), {"path": "/", "count": 3})
+        self.assertEqual(log.metadata, {"path": "/", "count": 3})
+
+        log.metadata = {}
+        self.assertEqual(log.metadata_blob, b"")
+        self.assertEqual(log.metadata, {})
+
+    def test_write_batch_stores_every_payload(self):
+        written = _write_batch(
+            [
+                _payload(),
+                _payload(event_type="SYSTEM_ERROR", metadata={}, request_ip="10.0.0.1", user_agent="pytest"),
+            ]
+        )
+
+        self.assertEqual(written, 2)
+        action = AuditLog.objects.get(event_type_code=AuditLog.EVENT_TYPE_CODES["ACTION"])
+        self.assertEqual(action.metadata, {"path": "/api/products/", "tags": ["a", "b"]})
+        self.assertIsNone(action.request_ip)
+        self.assertEqual(action.user_agent, "")
+        error = AuditLog.objects.get(event_type_code=AuditLog.EVENT_TYPE_CODES["SYSTEM_ERROR"])
+        self.assertEqual(error.metadata, {})
+        self.assertEqual(error.request_ip, "10.0.0.1")
+
+    def test_write_batch_ignores_empty_batches(self):
+        self.assertEqual(_write_batch([]), 0)
+        self.assertFalse(AuditLog.objects.exists())
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_eager_task_writes_immediately(self):
+        write_audit_log(_payload())
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_flush_trims_only_what_was_written(self):
+        client = mock.Mock()
+        client.lock.return_value.acquire.return_value = True
+        client.lrange.return_value = [msgpack.packb(_payload(), use_bin_type=True) for _ in range(3)]
+
+        with mock.patch("activity.tasks.AUDIT_BATCH_SIZE", 5):
+            self.assertEqual(_flush_buffer(client), 3)
+
+        client.lrange.assert_called_once_with(AUDIT_BUFFER_KEY, 0, 4)
+        client.ltrim.assert_called_once_with(AUDIT_BUFFER_KEY, 3, -1)
+        client.lock.return_value.release.assert_called_once()
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_flush_skips_when_another_flush_holds_the_lock(self):
+        client = mock.Mock()
+        client.lock.return_value.acquire.return_value = False
+
+        self.assertEqual(_flush_buffer(client), 0)
+        client.lrange.assert_not_called()
+
+    def test_failed_write_keeps_the_buffer(self):
+        client = mock.Mock()
+        client.lock.return_value.acquire.return_value = True
+        client.lrange.return_value = [msgpack.packb(_payload(), use_bin_type=True)]
+
+        with mock.patch("activity.tasks._write_batch", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                _flush_buffer(client)
+
+        client.ltrim.assert_not_called()
+        client.lock.return_value.release.assert_called_once()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CELERY_TASK_ALWAYS_EAGER=True,
+)
+class AuditSamplingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sampling = mock.patch.dict("activity.utils.AUDIT_SAMPLING", {"ACTION": 0.1}, clear=True)
+        self.sampling.start()
+        self.addCleanup(self.sampling.stop)
+        # Run the queued task inline whatever broker the environment points at.
+        delay = mock.patch.object(write_audit_log, "delay", side_effect=write_audit_log)
+        delay.start()
+        self.addCleanup(delay.stop)
+
+    def _record(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_event(event_type="ACTION", description="Accion anonima.", **kwargs)
+
+    def test_sampled_out_events_are_counted_not_written(self):
+        with mock.patch("activity.utils.random.random", return_value=0.5):
+            self._record()
+            self._record()
+
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(dropped_event_counts(), {"ACTION": 2})
+
+    def test_sampled_in_events_are_written(self):
+        with mock.patch("activity.utils.random.random", return_value=0.05):
+            self._record()
+
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertEqual(dropped_event_counts(), {})
+
+    def test_events_with_an_actor_are_never_sampled(self):
+        actor = get_user_model().objects.create_user(email="actor@example.com", password="Actor123!")
+        with mock.patch("activity.utils.random.random", return_value=0.99):
+            self._record(actor=actor)
+
+        self.assertEqual(AuditLog.objects.get().actor, actor)
+
+    def test_ignored_paths_are_dropped(self):
+        actor = get_user_model().objects.create_user(email="actor@example.com", password="Actor123!")
+        with mock.patch("activity.utils.AUDIT_IGNORED_PATHS", frozenset({"/healthz"})):
+            self._record(actor=actor, request=RequestFactory().get("/healthz"))
+
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(dropped_event_counts(), {"ACTION": 1})
+
+
+class AuditLogOrderingTests(APITestCase):
+    def test_event_type_ordering_is_still_accepted(self):
+        admin = get_user_model().objects.create_user(
+            email="admin@example.com",
+            password="Admin123!",
+            role="ADMIN",
+            is_staff=True,
+            is_email_verified=True,
+        )
+        self.client.force_authenticate(user=admin)
+        _write_batch([_payload(event_type="LOGIN"), _payload(event_type="ACTION"), _payload(event_type="DELETE")])
+
+        response = self.client.get(reverse("audit-log-list"), {"ordering": "-event_type"})
+
+        rows = response.data["results"] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row["event_type"] for row in rows], ["ACTION", "DELETE", "LOGIN"])
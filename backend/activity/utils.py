@@ -1,12 +1,71 @@
 from __future__ import annotations
 
+import logging
+import random
 from typing import Any
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 
 from .models import AuditLog
+from .tasks import write_audit_log
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+AUDIT_SAMPLING: dict[str, float] = getattr(settings, "AUDIT_SAMPLING", {})
+AUDIT_IGNORED_PATHS = frozenset(getattr(settings, "AUDIT_IGNORED_PATHS", ()))
+# See AUDIT_SAMPLING in settings for where these counters live.
+AUDIT_DROPPED_KEY_PREFIX = "audit:dropped:"
+
+# Shared metadata for events without any; payloads are only serialized, never mutated.
+_EMPTY: dict[str, Any] = {}
+
+
+def _should_skip(event_type: str, actor, request) -> bool:
+    if request is not None and getattr(request, "path", None) in AUDIT_IGNORED_PATHS:
+        return True
+    if actor is not None:
+        return False
+    return random.random() > AUDIT_SAMPLING.get(event_type, 1.0)
+
+
+def _dropped_key(event_type: str) -> str:
+    return f"{AUDIT_DROPPED_KEY_PREFIX}{event_type}"
+
+
+def _count_dropped(event_type: str) -> None:
+    key = _dropped_key(event_type)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # First drop of this type; add() loses the race to a concurrent
+            # creator instead of resetting its count.
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+    except Exception:  # noqa: BLE001 - counting must never break the request
+        logger.debug("No se pudo contar el evento de auditoria descartado %s", event_type, exc_info=True)
+
+
+def dropped_event_counts() -> dict[str, int]:
+    """Audit events dropped by sampling so far, per event type."""
+
+    keys = {_dropped_key(event_type): event_type for event_type in AuditLog.EventType.values}
+    return {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
+
+
+def audit_context(request) -> tuple[str | None, str]:
+    """Return the ``(ip, user_agent)`` pair stored on ``request.META``."""
+
+    meta = request.META
+    user_agent = meta.get("HTTP_USER_AGENT") or ""
+    if len(user_agent) > 255:
+        user_agent = user_agent[:255]
+    return meta.get("REMOTE_ADDR"), user_agent
 
 
 def record_event(
@@ -18,25 +77,37 @@ def record_event(
     entity_id: str | None = None,
     metadata: dict[str, Any] | None = None,
     request=None,
-) -> AuditLog:
-    """Create an audit log entry."""
+) -> None:
+    """Queue an audit log entry once the surrounding transaction commits.
+
+    Events recorded inside a transaction that rolls back are discarded with it.
+    """
+
+    event_type = str(event_type)
+    if _should_skip(event_type, actor, request):
+        _count_dropped(event_type)
+        return
 
     request_ip = None
     user_agent = ""
     if request is not None:
-        request_ip = getattr(request, "META", {}).get("REMOTE_ADDR")
-        user_agent = getattr(request, "META", {}).get("HTTP_USER_AGENT", "")
-
-    return AuditLog.objects.create(
-        actor=actor,
-        event_type=event_type,
-        entity_type=entity_type or "",
-        entity_id=entity_id or "",
-        description=description,
-        metadata=metadata or {},
-        request_ip=request_ip,
-        user_agent=user_agent[:255],
-    )
+        context = getattr(request, "_audit_ctx", None)
+        if context is None:
+            context = audit_context(request)
+        request_ip, user_agent = context
+
+    payload = {
+        "actor_id": str(actor.pk) if actor is not None else None,
+        "event_type": event_type,
+        "entity_type": entity_type or "",
+        "entity_id": entity_id or "",
+        "description": description,
+        "metadata": metadata or _EMPTY,
+        "request_ip": request_ip,
+        "user_agent": user_agent,
+        "created_at": timezone.now().isoformat(),
+    }
+    transaction.on_commit(lambda: write_audit_log.delay(payload))
 
 
 class AuditLogViewSetMixin:
@@ -44,14 +115,24 @@ class AuditLogViewSetMixin:
 
     audit_entity: str | None = None
 
+    _AUDIT_EVENTS = {
+        "create": (AuditLog.EventType.CREATE, "{} creado."),
+        "update": (AuditLog.EventType.UPDATE, "{} actualizado."),
+        "delete": (AuditLog.EventType.DELETE, "{} eliminado."),
+    }
+
     def _audit_entity(self, instance) -> str:
         return self.audit_entity or instance.__class__.__name__
 
     def _audit_actor(self):
+        try:
+            return self._audit_actor_cached
+        except AttributeError:
+            pass
         user = getattr(self.request, "user", None)
-        if getattr(user, "is_authenticated", False):
-            return user
-        return None
+        actor = user if getattr(user, "is_authenticated", False) else None
+        self._audit_actor_cached = actor
+        return actor
 
     def _audit_metadata(self, extra: dict[str, Any] | None = None) -> dict[str, Any]:
         metadata = {
@@ -62,35 +143,24 @@ class AuditLogViewSetMixin:
             metadata.update(extra)
         return metadata
 
-    def log_create(self, instance, extra: dict[str, Any] | None = None) -> None:
+    def _log(self, kind: str, instance, extra: dict[str, Any] | None = None) -> None:
+        event_type, template = self._AUDIT_EVENTS[kind]
+        entity = self._audit_entity(instance)
         record_event(
-            event_type=AuditLog.EventType.CREATE,
-            description=f"{self._audit_entity(instance)} creado.",
+            event_type=event_type,
+            description=template.format(entity),
             actor=self._audit_actor(),
-            entity_type=self._audit_entity(instance),
+            entity_type=entity,
             entity_id=str(getattr(instance, "pk", "")),
             metadata=self._audit_metadata(extra),
             request=self.request,
         )
 
+    def log_create(self, instance, extra: dict[str, Any] | None = None) -> None:
+        self._log("create", instance, extra)
+
     def log_update(self, instance, extra: dict[str, Any] | None = None) -> None:
-        record_event(
-            event_type=AuditLog.EventType.UPDATE,
-            description=f"{self._audit_entity(instance)} actualizado.",
-            actor=self._audit_actor(),
-            entity_type=self._audit_entity(instance),
-            entity_id=str(getattr(instance, "pk", "")),
-            metadata=self._audit_metadata(extra),
-            request=self.request,
-        )
+        self._log("update", instance, extra)
 
     def log_delete(self, instance, extra: dict[str, Any] | None = None) -> None:
-        record_event(
-            event_type=AuditLog.EventType.DELETE,
-            description=f"{self._audit_entity(instance)} eliminado.",
-            actor=self._audit_actor(),
-            entity_type=self._audit_entity(instance),
-            entity_id=str(getattr(instance, "pk", "")),
-            metadata=self._audit_metadata(extra),
-            request=self.request,
-        )
+        self._log("delete", instance, extra)
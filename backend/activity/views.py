@@ -1,9 +1,38 @@
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+from django_filters import rest_framework as django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, viewsets
 from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
 from .models import AuditLog
-from .serializers import AuditLogSerializer
+from .serializers import AUDIT_LOG_LIST_VALUES, AuditLogSerializer, serialize_auditlog_row
+
+
+class AuditLogFilter(django_filters.FilterSet):
+    event_type = django_filters.ChoiceFilter(choices=AuditLog.EventType.choices, method="filter_event_type")
+
+    class Meta:
+        model = AuditLog
+        fields = ["entity_type"]
+
+    def filter_event_type(self, queryset, name, value):
+        return queryset.filter(event_type_code=AuditLog.EVENT_TYPE_CODES[value])
+
+
+class AuditLogOrderingFilter(filters.OrderingFilter):
+    """Keeps ``?ordering=event_type`` working now that the column is ``event_type_code``."""
+
+    field_aliases = {"event_type": "event_type_code"}
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        aliased = []
+        for term in fields:
+            descending = term.startswith("-")
+            name = self.field_aliases.get(term.lstrip("-"), term.lstrip("-"))
+            aliased.append(f"-{name}" if descending else name)
+        return super().remove_invalid_fields(queryset, aliased, view, request)
 
 
 class AuditLogViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
@@ -11,8 +40,37 @@ class AuditLogViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminUser]
-    queryset = AuditLog.objects.select_related("actor").all()
+    queryset = (
+        AuditLog.objects.only(
+            "id",
+            "event_type_code",
+            "entity_type",
+            "entity_id",
+            "description",
+            "metadata_blob",
+            "request_ip",
+            "user_agent",
+            "created_at",
+            "actor_id",
+        )
+        .annotate(
+            actor_email_ann=F("actor__email"),
+            actor_full_name=Coalesce(
+                NullIf(Trim(Concat(F("actor__first_name"), Value(" "), F("actor__last_name"))), Value("")),
+                F("actor__email"),
+            ),
+        )
+        .all()
+    )
     ordering = "-created_at"
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ["event_type", "entity_type"]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, AuditLogOrderingFilter]
+    filterset_class = AuditLogFilter
+    ordering_fields = ["created_at", "event_type_code", "entity_type", "entity_id"]
     search_fields = ["description", "entity_type", "entity_id", "actor__email"]
+
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(*AUDIT_LOG_LIST_VALUES)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([serialize_auditlog_row(row) for row in page])
+        return Response([serialize_auditlog_row(row) for row in rows])
@@ -0,0 +1,25 @@
+"""Authentication backends for authx."""
+from __future__ import annotations
+
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+
+
+class EmailBackend(ModelBackend):
+    """Model backend that loads a narrow user row for the password check."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User.objects.for_authentication().get(email=username)
+        except User.DoesNotExist:
+            # Run the hasher anyway so missing accounts take as long as real ones.
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,12 @@
+"""Password hashers for authx."""
+from __future__ import annotations
+
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with the OWASP minimum profile (46 MiB, t=1, p=1)."""
+
+    time_cost = 1
+    memory_cost = 46 * 1024
+    parallelism = 1
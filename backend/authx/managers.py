@@ -11,6 +11,11 @@ class UserManager(BaseUserManager):
 
     use_in_migrations = True
 
+    def for_authentication(self):
+        """Users with only the columns needed to check credentials."""
+
+        return self.only("id", "email", "password", "is_active", "is_email_verified")
+
     def _create_user(self, email: str, password: str | None, **extra_fields: Any):
         if not email:
             raise ValueError("El usuario debe tener un email")
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authx', '0002_rename_authx_email_user_pu_9acf76_idx_authx_email_user_id_9a2db4_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailverificationtoken',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['user', 'purpose'], name='evt_active_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+import logging
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+
+def set_aside_case_duplicates(apps, schema_editor):
+    """Keep one account per case-insensitive email so the constraint can be added.
+
+    The account that logged in most recently (then the oldest one) keeps the
+    address. The others are deactivated and their email gets a
+    ``.duplicado-<id>`` suffix, so nothing is deleted and they can be merged
+    by hand afterwards.
+    """
+
+    User = apps.get_model("authx", "User")
+    duplicated = (
+        # order_by() keeps the default "email" ordering out of the GROUP BY.
+        User.objects.annotate(email_ci=Lower("email"))
+        .order_by()
+        .values("email_ci")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+        .values_list("email_ci", flat=True)
+    )
+    for email_ci in list(duplicated):
+        accounts = list(
+            User.objects.annotate(email_ci=Lower("email"))
+            .filter(email_ci=email_ci)
+            .order_by(F("last_login").desc(nulls_last=True), "created_at")
+            .values_list("id", flat=True)
+        )
+        keeper, *others = accounts
+        for user_id in others:
+            suffix = f".duplicado-{user_id}"
+            User.objects.filter(pk=user_id).update(email=email_ci[: 255 - len(suffix)] + suffix, is_active=False)
+        logger.warning(
+            "Email %s repetido sin distinguir mayusculas: se conserva %s; desactivados %s",
+            email_ci,
+            keeper,
+            ", ".join(str(user_id) for user_id in others),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authx', '0003_emailverificationtoken_evt_active_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_aside_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_ci_unique'),
+        ),
+    ]
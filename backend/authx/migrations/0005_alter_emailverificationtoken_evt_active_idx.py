@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authx', '0004_user_user_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emailverificationtoken',
+            name='evt_active_idx',
+        ),
+        migrations.AddIndex(
+            model_name='emailverificationtoken',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['user', 'purpose', 'code'], name='evt_active_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def keep_latest_token(apps, schema_editor):
+    EmailVerificationToken = apps.get_model("authx", "EmailVerificationToken")
+    latest = (
+        EmailVerificationToken.objects.filter(user=OuterRef("user"), purpose=OuterRef("purpose"))
+        .order_by("-created_at")
+        .values("pk")[:1]
+    )
+    EmailVerificationToken.objects.exclude(pk=Subquery(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authx', '0005_alter_emailverificationtoken_evt_active_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_token, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='emailverificationtoken',
+            constraint=models.UniqueConstraint(fields=('user', 'purpose'), name='evt_user_purpose_uniq'),
+        ),
+    ]
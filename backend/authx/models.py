@@ -5,6 +5,7 @@ import uuid
 
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 from .managers import UserManager
@@ -35,6 +36,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     class Meta:
         ordering = ["email"]
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="user_email_ci_unique"),
+        ]
         verbose_name = "Usuario"
         verbose_name_plural = "Usuarios"
 
@@ -64,6 +68,14 @@ class EmailVerificationToken(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["user", "purpose", "is_used"]),
+            models.Index(
+                fields=["user", "purpose", "code"],
+                condition=models.Q(is_used=False),
+                name="evt_active_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "purpose"], name="evt_user_purpose_uniq"),
         ]
         verbose_name = "Token de verificacion"
         verbose_name_plural = "Tokens de verificacion"
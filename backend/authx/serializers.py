@@ -1,7 +1,11 @@
 ﻿"""Serializers for authx app."""
 from __future__ import annotations
 
-from django.contrib.auth import get_user_model
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.db import models, transaction
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -11,8 +15,22 @@ from customers.models import Customer
 from .models import EmailVerificationToken, User
 from .services import send_verification_email, validate_token
 
+# Malformed codes are rejected before validate_token touches the database.
+VERIFICATION_CODE_RE = re.compile(r"^\d{6}$")
+
+
+class LowerEmailField(serializers.EmailField):
+    """Email field that normalizes the address to lower case while parsing."""
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(data).lower()
+
 
 class UserSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.EmailField: LowerEmailField,
+    }
     password = serializers.CharField(write_only=True, required=False, allow_blank=False)
 
     class Meta:
@@ -34,9 +52,6 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop("password", None)
-        email = validated_data.get("email")
-        if email:
-            validated_data["email"] = email.lower()
         user = User(**validated_data)
         if password:
             user.set_password(password)
@@ -50,29 +65,55 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         password = validated_data.pop("password", None)
         should_send_verification = False
+        dirty: set[str] = set()
 
         if "email" in validated_data:
-            new_email = validated_data["email"].lower()
+            new_email = validated_data["email"]
             if new_email != instance.email:
                 instance.email = new_email
+                dirty.add("email")
                 should_send_verification = True
         for attr, value in validated_data.items():
-            if attr == "email":
+            if attr == "email" or getattr(instance, attr) == value:
                 continue
             setattr(instance, attr, value)
+            dirty.add(attr)
         if password:
             instance.set_password(password)
+            dirty.add("password")
             should_send_verification = True
 
         if should_send_verification:
             instance.is_email_verified = False
-        instance.is_staff = instance.role == User.Roles.ADMIN
-        instance.save()
+            dirty.add("is_email_verified")
+        if "role" in dirty:
+            instance.is_staff = instance.role == User.Roles.ADMIN
+            dirty.add("is_staff")
+        if dirty:
+            instance.save(update_fields=[*dirty, "updated_at"])
         if should_send_verification:
             send_verification_email(instance)
         return instance
 
 
+class UserListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = [
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "role",
+            "is_active",
+            "is_staff",
+            "is_email_verified",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class EmailAwareTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -85,8 +126,8 @@ class EmailAwareTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 
 class EmailVerificationSerializer(serializers.Serializer):
-    email = serializers.EmailField()
-    code = serializers.CharField(max_length=6)
+    email = LowerEmailField()
+    code = serializers.RegexField(VERIFICATION_CODE_RE, error_messages={"invalid": "Codigo invalido."})
 
     def validate(self, attrs):
         try:
@@ -102,13 +143,12 @@ class EmailVerificationSerializer(serializers.Serializer):
 
 
 class ResendVerificationSerializer(serializers.Serializer):
-    email = serializers.EmailField()
+    email = LowerEmailField()
 
     def validate_email(self, value):
-        user_model = get_user_model()
         try:
-            user = user_model.objects.get(email=value.lower())
-        except user_model.DoesNotExist as exc:
+            user = User.objects.get(email=value)
+        except User.DoesNotExist as exc:
             raise serializers.ValidationError("No encontramos una cuenta con este correo.") from exc
         if user.is_email_verified:
             raise serializers.ValidationError("La cuenta ya esta verificada.")
@@ -117,21 +157,20 @@ class ResendVerificationSerializer(serializers.Serializer):
 
 
 class PasswordResetRequestSerializer(serializers.Serializer):
-    email = serializers.EmailField()
+    email = LowerEmailField()
 
     def validate_email(self, value):
-        user_model = get_user_model()
         try:
-            user = user_model.objects.get(email=value.lower())
-        except user_model.DoesNotExist as exc:
+            user = User.objects.get(email=value)
+        except User.DoesNotExist as exc:
             raise serializers.ValidationError("No encontramos una cuenta con este correo.") from exc
         self.context["user"] = user
         return value
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
-    email = serializers.EmailField()
-    code = serializers.CharField(max_length=6)
+    email = LowerEmailField()
+    code = serializers.RegexField(VERIFICATION_CODE_RE, error_messages={"invalid": "Codigo invalido."})
     password = serializers.CharField(write_only=True, min_length=6)
 
     def validate(self, attrs):
@@ -149,17 +188,20 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     def save(self):
         token = self.validated_data["token"]
         user = token.user
-        password = self.validated_data["password"]
-        user.set_password(password)
+        user.password = make_password(self.validated_data["password"])
         user.is_email_verified = True
-        user.save(update_fields=["password", "is_email_verified", "updated_at"])
-        token.is_used = True
-        token.save(update_fields=["is_used"])
+        with transaction.atomic():
+            User.objects.filter(pk=token.user_id).update(
+                password=user.password,
+                is_email_verified=True,
+                updated_at=timezone.now(),
+            )
+            EmailVerificationToken.objects.filter(pk=token.pk).update(is_used=True)
         return user
 
 
 class RegisterSerializer(serializers.Serializer):
-    email = serializers.EmailField()
+    email = LowerEmailField()
     password = serializers.CharField(min_length=6, write_only=True)
     first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
     last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
@@ -167,30 +209,28 @@ class RegisterSerializer(serializers.Serializer):
     doc_id = serializers.CharField(max_length=30, required=False, allow_blank=True)
 
     def validate_email(self, value: str):
-        user_model = get_user_model()
-        email = value.lower()
-        if user_model.objects.filter(email=email).exists():
+        if User.objects.filter(email=value).exists():
             raise serializers.ValidationError("Ya existe una cuenta con este email.")
-        return email
+        return value
 
     def create(self, validated_data):
-        user_model = get_user_model()
         password = validated_data.pop("password")
         phone = validated_data.pop("phone", "")
         doc_id = validated_data.pop("doc_id", "")
         email = validated_data.pop("email")
 
-        user = user_model.objects.create_user(
-            email=email,
-            password=password,
-            role=User.Roles.CLIENT,
-            is_active=False,
-            is_email_verified=False,
-            **validated_data,
-        )
-
-        Customer.objects.create(user=user, phone=phone, doc_id=doc_id)
-        send_verification_email(user)
+        # The verification email itself is only queued once this block commits.
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email=email,
+                password=password,
+                role=User.Roles.CLIENT,
+                is_active=False,
+                is_email_verified=False,
+                **validated_data,
+            )
+            Customer.objects.create(user=user, phone=phone, doc_id=doc_id)
+            send_verification_email(user)
         return user
 
 
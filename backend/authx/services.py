@@ -1,130 +1,120 @@
 """Utility functions for user verification and transactional emails."""
 from __future__ import annotations
 
-import logging
-import random
+import secrets
+import uuid
 from datetime import timedelta
 
-import requests
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
 from django.utils import timezone
 
 from .models import EmailVerificationToken, User
-
-logger = logging.getLogger(__name__)
+from .tasks import send_email_task
 
 CODE_TTL_MINUTES = 15
 
-BREVO_API_KEY = getattr(settings, "BREVO_API_KEY", "")
-BREVO_SENDER_EMAIL = getattr(settings, "BREVO_SENDER_EMAIL", settings.DEFAULT_FROM_EMAIL)
-BREVO_SENDER_NAME = getattr(settings, "BREVO_SENDER_NAME", "SmartSales365")
-BREVO_API_URL = "https://api.brevo.com/v3/smtp/email"
-BREVO_HTTP_TIMEOUT = getattr(settings, "EMAIL_TIMEOUT", 20)
-BREVO_USE_SMTP_FALLBACK = getattr(settings, "BREVO_USE_SMTP_FALLBACK", False)
+FRONTEND_BASE_URL = getattr(settings, "FRONTEND_BASE_URL", "http://localhost:5173")
+
+# Static parts of the email bodies, joined once at import so each send only
+# interpolates the recipient name and the code.
+VERIFICATION_SUBJECT = "Codigo de verificacion SmartSales365"
+_VERIFY_BODY_PREFIX = "Hola "
+_VERIFY_BODY_MID = ",\n\nTu codigo de verificacion es: "
+_VERIFY_BODY_SUFFIX = (
+    ".\n"
+    "Ingresa este codigo en la pantalla de verificacion para activar tu cuenta.\n\n"
+    f"Tambien puedes ir a: {FRONTEND_BASE_URL}/verify-email\n\n"
+    "Este codigo caduca en 15 minutos.\n\n"
+    "Equipo SmartSales365"
+)
+
+PASSWORD_RESET_SUBJECT = "Codigo para restablecer contrasena SmartSales365"
+_RESET_BODY_PREFIX = "Hola "
+_RESET_BODY_MID = ",\n\nTu codigo para restablecer la contrasena es: "
+_RESET_BODY_SUFFIX = (
+    ".\n"
+    f"Ingresalo junto con tu nueva contrasena en {FRONTEND_BASE_URL}/reset-password.\n\n"
+    "El codigo caduca en 15 minutos.\n\n"
+    "Si no solicitaste este cambio, ignora este correo.\n\n"
+    "Equipo SmartSales365"
+)
+
+# Each user keeps a single row per purpose (evt_user_purpose_uniq), so issuing
+# a new code overwrites the previous one in one statement. RETURNING hands back
+# the stored row, which keeps its original id when it already existed.
+_UPSERT_TOKEN_SQL = f"""
+    INSERT INTO {EmailVerificationToken._meta.db_table}
+        (id, user_id, purpose, code, expires_at, is_used, created_at)
+    VALUES (%s, %s, %s, %s, %s, FALSE, %s)
+    ON CONFLICT (user_id, purpose) DO UPDATE SET
+        code = EXCLUDED.code,
+        expires_at = EXCLUDED.expires_at,
+        is_used = FALSE,
+        created_at = EXCLUDED.created_at
+    RETURNING id, user_id, purpose, code, expires_at, is_used, created_at
+"""
 
 
 def _generate_code() -> str:
-    return f"{random.randint(0, 999999):06d}"
+    return f"{secrets.randbelow(1_000_000):06d}"
 
 
 def create_token(user: User, purpose: str) -> EmailVerificationToken:
-    EmailVerificationToken.objects.filter(user=user, purpose=purpose, is_used=False).update(is_used=True)
-    token = EmailVerificationToken.objects.create(
-        user=user,
-        purpose=purpose,
-        code=_generate_code(),
-        expires_at=timezone.now() + timedelta(minutes=CODE_TTL_MINUTES),
-    )
-    return token
-
-
-def _send_email_via_brevo(to_email: str, subject: str, text_body: str) -> bool:
-    if not BREVO_API_KEY or not BREVO_SENDER_EMAIL:
-        return False
-
-    payload = {
-        "sender": {"email": BREVO_SENDER_EMAIL, "name": BREVO_SENDER_NAME},
-        "to": [{"email": to_email}],
-        "subject": subject,
-        "textContent": text_body,
-    }
-    headers = {
-        "api-key": BREVO_API_KEY,
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-
-    try:
-        response = requests.post(BREVO_API_URL, json=payload, headers=headers, timeout=BREVO_HTTP_TIMEOUT)
-    except requests.RequestException as exc:
-        logger.error("Brevo API request error: %s", exc)
-        return False
-
-    if not response.ok:
-        logger.error("Brevo API responded with %s: %s", response.status_code, response.text)
-        return False
-
-    logger.debug("Brevo email sent to %s", to_email)
-    return True
+    now = timezone.now()
+    return list(
+        EmailVerificationToken.objects.raw(
+            _UPSERT_TOKEN_SQL,
+            [
+                uuid.uuid4(),
+                user.pk,
+                purpose,
+                _generate_code(),
+                now + timedelta(minutes=CODE_TTL_MINUTES),
+                now,
+            ],
+        )
+    )[0]
 
 
 def _send_email(to_email: str, subject: str, text_body: str) -> None:
-    if _send_email_via_brevo(to_email, subject, text_body):
-        return
-
-    if not BREVO_USE_SMTP_FALLBACK:
-        logger.error("Fallo el envio via Brevo y el fallback SMTP esta deshabilitado (destino=%s)", to_email)
-        return
-
-    try:
-        send_mail(subject, text_body, settings.DEFAULT_FROM_EMAIL, [to_email])
-    except Exception as exc:  # pragma: no cover
-        logger.error("SMTP fallback tambien fallo: %s", exc)
+    # Delivery happens in a worker once the token row is committed, so Brevo
+    # latency never holds the request or its transaction open.
+    transaction.on_commit(lambda: send_email_task.delay(to_email, subject, text_body))
 
 
 def send_verification_email(user: User) -> EmailVerificationToken:
     token = create_token(user, EmailVerificationToken.Purpose.REGISTER)
-    subject = "Codigo de verificacion SmartSales365"
-    frontend_url = getattr(settings, "FRONTEND_BASE_URL", "http://localhost:5173")
-    body = (
-        f"Hola {user.first_name or user.email},\n\n"
-        f"Tu codigo de verificacion es: {token.code}.\n"
-        f"Ingresa este codigo en la pantalla de verificacion para activar tu cuenta.\n\n"
-        f"Tambien puedes ir a: {frontend_url}/verify-email\n\n"
-        "Este codigo caduca en 15 minutos.\n\n"
-        "Equipo SmartSales365"
-    )
-    _send_email(user.email, subject, body)
+    body = f"{_VERIFY_BODY_PREFIX}{user.first_name or user.email}{_VERIFY_BODY_MID}{token.code}{_VERIFY_BODY_SUFFIX}"
+    _send_email(user.email, VERIFICATION_SUBJECT, body)
     return token
 
 
 def send_password_reset_email(user: User) -> EmailVerificationToken:
     token = create_token(user, EmailVerificationToken.Purpose.PASSWORD_RESET)
-    subject = "Codigo para restablecer contrasena SmartSales365"
-    frontend_url = getattr(settings, "FRONTEND_BASE_URL", "http://localhost:5173")
-    body = (
-        f"Hola {user.first_name or user.email},\n\n"
-        f"Tu codigo para restablecer la contrasena es: {token.code}.\n"
-        f"Ingresalo junto con tu nueva contrasena en {frontend_url}/reset-password.\n\n"
-        "El codigo caduca en 15 minutos.\n\n"
-        "Si no solicitaste este cambio, ignora este correo.\n\n"
-        "Equipo SmartSales365"
-    )
-    _send_email(user.email, subject, body)
+    body = f"{_RESET_BODY_PREFIX}{user.first_name or user.email}{_RESET_BODY_MID}{token.code}{_RESET_BODY_SUFFIX}"
+    _send_email(user.email, PASSWORD_RESET_SUBJECT, body)
     return token
 
 
 def validate_token(email: str, code: str, purpose: str) -> EmailVerificationToken:
-    try:
-        token = EmailVerificationToken.objects.select_related("user").get(
-            user__email=email.lower(), code=code, purpose=purpose
-        )
-    except EmailVerificationToken.DoesNotExist as exc:
-        raise ValueError("Codigo invalido.") from exc
-
-    if token.is_used:
-        raise ValueError("El codigo ya fue utilizado.")
-    if token.is_expired:
-        raise ValueError("El codigo ha expirado.")
+    # Resolve the user through the unique email index first, then probe the
+    # partial (user, purpose, code) index with every predicate in the query.
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        raise ValueError("Codigo invalido.")
+
+    tokens = EmailVerificationToken.objects.filter(user_id=user.pk, purpose=purpose, code=code)
+    token = (
+        tokens.only("id", "is_used", "expires_at", "user_id")
+        .filter(is_used=False, expires_at__gt=timezone.now())
+        .first()
+    )
+    if token is None:
+        # Only rejected codes pay for a second lookup to pick the message.
+        is_used = tokens.values_list("is_used", flat=True).first()
+        if is_used is None:
+            raise ValueError("Codigo invalido.")
+        raise ValueError("El codigo ya fue utilizado." if is_used else "El codigo ha expirado.")
+    token.user = user
     return token
@@ -0,0 +1,73 @@
+"""Background tasks for transactional emails."""
+from __future__ import annotations
+
+import logging
+
+import requests
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FROM_EMAIL = settings.DEFAULT_FROM_EMAIL
+BREVO_API_KEY = getattr(settings, "BREVO_API_KEY", "")
+BREVO_SENDER_EMAIL = getattr(settings, "BREVO_SENDER_EMAIL", DEFAULT_FROM_EMAIL)
+BREVO_SENDER_NAME = getattr(settings, "BREVO_SENDER_NAME", "SmartSales365")
+BREVO_API_URL = "https://api.brevo.com/v3/smtp/email"
+BREVO_HTTP_TIMEOUT = getattr(settings, "EMAIL_TIMEOUT", 20)
+BREVO_USE_SMTP_FALLBACK = getattr(settings, "BREVO_USE_SMTP_FALLBACK", False)
+
+# Shared per worker process so keep-alive connections to Brevo are reused
+# instead of paying a TLS handshake for every email. The adapter never retries:
+# Brevo's send endpoint is not idempotent, so send_email_task's Celery backoff
+# is the only retry layer.
+_BREVO_SESSION = requests.Session()
+_BREVO_SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=0))
+_BREVO_SESSION.headers.update(
+    {
+        "api-key": BREVO_API_KEY,
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+)
+
+
+def _send_email_via_brevo(to_email: str, subject: str, text_body: str) -> bool:
+    if not BREVO_API_KEY or not BREVO_SENDER_EMAIL:
+        return False
+
+    payload = {
+        "sender": {"email": BREVO_SENDER_EMAIL, "name": BREVO_SENDER_NAME},
+        "to": [{"email": to_email}],
+        "subject": subject,
+        "textContent": text_body,
+    }
+
+    # Connection errors propagate so the task is retried with backoff.
+    response = _BREVO_SESSION.post(BREVO_API_URL, json=payload, timeout=BREVO_HTTP_TIMEOUT)
+
+    if not response.ok:
+        logger.error("Brevo API responded with %s: %s", response.status_code, response.text)
+        return False
+
+    logger.debug("Brevo email sent to %s", to_email)
+    return True
+
+
+@shared_task(bind=True, autoretry_for=(requests.RequestException,), retry_backoff=True, max_retries=3)
+def send_email_task(self, to_email: str, subject: str, text_body: str) -> None:
+    """Deliver a transactional email through Brevo, falling back to SMTP."""
+
+    if _send_email_via_brevo(to_email, subject, text_body):
+        return
+
+    if not BREVO_USE_SMTP_FALLBACK:
+        logger.error("Fallo el envio via Brevo y el fallback SMTP esta deshabilitado (destino=%s)", to_email)
+        return
+
+    try:
+        send_mail(subject, text_body, DEFAULT_FROM_EMAIL, [to_email])
+    except Exception as exc:  # pragma: no cover
+        logger.error("SMTP fallback tambien fallo: %s", exc)
@@ -1,9 +1,18 @@
 ﻿"""Tests for authentication endpoints."""
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from authx.models import EmailVerificationToken
+from authx.services import create_token
+
 
 class JWTAuthTests(APITestCase):
     def setUp(self):
@@ -24,3 +33,103 @@ class JWTAuthTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("access", response.data)
         self.assertIn("refresh", response.data)
+
+
+class CreateTokenTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="cliente@test.com", password="Cliente123!")
+
+    def test_returns_the_stored_row(self):
+        token = create_token(self.user, EmailVerificationToken.Purpose.REGISTER)
+
+        stored = EmailVerificationToken.objects.get(user=self.user)
+        self.assertEqual(token.pk, stored.pk)
+        self.assertEqual(token.code, stored.code)
+        self.assertFalse(stored.is_used)
+
+    def test_reissuing_overwrites_the_previous_code(self):
+        first = create_token(self.user, EmailVerificationToken.Purpose.REGISTER)
+        EmailVerificationToken.objects.filter(pk=first.pk).update(is_used=True)
+
+        second = create_token(self.user, EmailVerificationToken.Purpose.REGISTER)
+
+        self.assertEqual(second.pk, first.pk)
+        stored = EmailVerificationToken.objects.get(user=self.user)
+        self.assertEqual(stored.code, second.code)
+        self.assertFalse(stored.is_used)
+        self.assertGreater(stored.expires_at, timezone.now())
+
+    def test_purposes_keep_separate_rows(self):
+        create_token(self.user, EmailVerificationToken.Purpose.REGISTER)
+        create_token(self.user, EmailVerificationToken.Purpose.PASSWORD_RESET)
+
+        self.assertEqual(EmailVerificationToken.objects.filter(user=self.user).count(), 2)
+
+
+class TokenDedupMigrationTests(TransactionTestCase):
+    migrate_from = ("authx", "0005_alter_emailverificationtoken_evt_active_idx")
+    migrate_to = ("authx", "0006_emailverificationtoken_evt_user_purpose_uniq")
+
+    def _migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        self._migrate(self.migrate_to)
+
+    def test_keeps_only_the_latest_token_per_purpose(self):
+        apps = self._migrate(self.migrate_from)
+        User = apps.get_model("authx", "User")
+        Token = apps.get_model("authx", "EmailVerificationToken")
+        user = User.objects.create(email="dup@test.com", password="!")
+        now = timezone.now()
+        tokens = [
+            Token.objects.create(user=user, code=f"{index:06d}", purpose="REGISTER", expires_at=now)
+            for index in range(3)
+        ]
+        for age, token in enumerate(tokens):
+            Token.objects.filter(pk=token.pk).update(created_at=now - timedelta(minutes=age))
+        reset = Token.objects.create(user=user, code="999999", purpose="PASSWORD_RESET", expires_at=now)
+
+        apps = self._migrate(self.migrate_to)
+
+        Token = apps.get_model("authx", "EmailVerificationToken")
+        self.assertEqual(
+            set(Token.objects.values_list("pk", flat=True)),
+            {tokens[0].pk, reset.pk},
+        )
+
+
+class EmailCaseDedupMigrationTests(TransactionTestCase):
+    migrate_from = ("authx", "0003_emailverificationtoken_evt_active_idx")
+    migrate_to = ("authx", "0004_user_user_email_ci_unique")
+
+    def _migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes("authx"))
+
+    def test_case_duplicates_are_set_aside_before_the_constraint(self):
+        apps = self._migrate(self.migrate_from)
+        User = apps.get_model("authx", "User")
+        now = timezone.now()
+        keeper = User.objects.create(email="ana@test.com", password="!", last_login=now)
+        other = User.objects.create(email="Ana@Test.com", password="!")
+        unrelated = User.objects.create(email="luis@test.com", password="!")
+
+        apps = self._migrate(self.migrate_to)
+
+        User = apps.get_model("authx", "User")
+        self.assertEqual(User.objects.get(pk=keeper.pk).email, "ana@test.com")
+        moved = User.objects.get(pk=other.pk)
+        self.assertEqual(moved.email, f"ana@test.com.duplicado-{other.pk}")
+        self.assertFalse(moved.is_active)
+        self.assertTrue(User.objects.get(pk=unrelated.pk).is_active)
@@ -1,5 +1,7 @@
 ﻿"""ViewSets and auth endpoints for authx app."""
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import filters
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
@@ -11,6 +13,7 @@ from activity.mixins import AuditableModelViewSet
 from activity.models import AuditLog
 from activity.utils import record_event
 
+from .models import EmailVerificationToken, User
 from .serializers import (
     EmailAwareTokenObtainPairSerializer,
     EmailVerificationSerializer,
@@ -19,6 +22,7 @@ from .serializers import (
     PasswordResetRequestSerializer,
     ResendVerificationSerializer,
     RegisterSerializer,
+    UserListSerializer,
     UserSerializer,
     ChangePasswordSerializer,
 )
@@ -29,12 +33,28 @@ class UserViewSet(AuditableModelViewSet):
     """CRUD viewset para usuarios (solo administradores)."""
 
     serializer_class = UserSerializer
-    queryset = get_user_model().objects.all().order_by("email")
+    queryset = get_user_model().objects.only(
+        "id",
+        "email",
+        "first_name",
+        "last_name",
+        "role",
+        "is_active",
+        "is_staff",
+        "is_email_verified",
+        "created_at",
+        "updated_at",
+    ).order_by("email")
     permission_classes = [IsAdminUser]
     filter_backends = [filters.SearchFilter]
     search_fields = ["email", "first_name", "last_name"]
     audit_entity = "Usuario"
 
+    def get_serializer_class(self):
+        if self.action == "list":
+            return UserListSerializer
+        return super().get_serializer_class()
+
 
 class EmailVerificationView(APIView):
     permission_classes = [AllowAny]
@@ -43,12 +63,13 @@ class EmailVerificationView(APIView):
         serializer = EmailVerificationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         token = serializer.validated_data["token"]
-        user = token.user
-        user.is_email_verified = True
-        user.is_active = True
-        user.save(update_fields=["is_email_verified", "is_active", "updated_at"])
-        token.is_used = True
-        token.save(update_fields=["is_used"])
+        with transaction.atomic():
+            User.objects.filter(pk=token.user_id).update(
+                is_email_verified=True,
+                is_active=True,
+                updated_at=timezone.now(),
+            )
+            EmailVerificationToken.objects.filter(pk=token.pk).update(is_used=True)
         return Response({"detail": "Cuenta verificada correctamente."})
 
 
@@ -17,6 +17,7 @@ class ProductFeatureInline(admin.TabularInline):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("sku", "name", "category", "price", "stock", "is_active")
+    list_select_related = ("category",)
     list_filter = ("category", "is_active")
     search_fields = ("name", "sku")
     inlines = [ProductImageInline, ProductFeatureInline]
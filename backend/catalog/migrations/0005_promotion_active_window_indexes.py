@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_promotion_promotion_promotion_discount_gt_zero_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['is_active', 'start_date', 'end_date'], name='promo_active_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_date', 'end_date'], name='promo_active_partial'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_current_price(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    # Promotion discounts are applied by the periodic refresh task.
+    Product.objects.update(current_price=models.F("price"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='current_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='active_promotion',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.promotion'),
+        ),
+        migrations.RunPython(fill_current_price, migrations.RunPython.noop),
+    ]
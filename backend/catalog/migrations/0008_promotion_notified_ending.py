@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_current_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotion',
+            name='notified_ending',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+
+
+def fill_storage_key(apps, schema_editor):
+    ProductImage = apps.get_model("catalog", "ProductImage")
+    images = list(ProductImage.objects.only("id", "url"))
+    for image in images:
+        if image.url:
+            image.storage_key = urlsplit(image.url).path.lstrip("/") or None
+    ProductImage.objects.bulk_update(images, ["storage_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_promotion_notified_ending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='storage_key',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_storage_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('catalog', '0009_productimage_storage_key'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-created_at'], name='product_active_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_active', '-created_at'], name='product_cat_active_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='promotion',
+            index=models.Index(fields=['scope', 'is_active'], name='promo_scope_active_idx'),
+        ),
+    ]
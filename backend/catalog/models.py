@@ -3,12 +3,17 @@ from __future__ import annotations
 
 import uuid
 
+from datetime import timedelta
 from decimal import Decimal
+from urllib.parse import urlsplit
 
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models
 from django.db.models import CheckConstraint, Q, F
+from django.db.models.functions import Upper
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 
 class Category(models.Model):
@@ -22,6 +27,9 @@ class Category(models.Model):
         ordering = ["name"]
         verbose_name = "Categoria"
         verbose_name_plural = "Categorias"
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="category_name_trgm"),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -45,6 +53,17 @@ class Product(models.Model):
     weight_kg = models.DecimalField(max_digits=8, decimal_places=3, default=0)
     is_active = models.BooleanField(default=True)
     cover_image_url = models.TextField(null=True, blank=True)
+    # Effective price after the best current promotion, maintained by
+    # promotion_service.refresh_current_prices.
+    current_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+    active_promotion = models.ForeignKey(
+        "Promotion",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -52,6 +71,17 @@ class Product(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
+        # icontains compiles to UPPER(col) LIKE UPPER(%s) on PostgreSQL, so the
+        # trigram indexes are built over UPPER() to serve admin search.
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="product_name_trgm"),
+            GinIndex(OpClass(Upper("sku"), name="gin_trgm_ops"), name="product_sku_trgm"),
+            # Default catalog listing: active products, newest first, optionally by category.
+            models.Index(fields=["is_active", "-created_at"], name="product_active_recent_idx"),
+            models.Index(fields=["category", "is_active", "-created_at"], name="product_cat_active_recent_idx"),
+            # Staff listings and cursor pages over every product.
+            models.Index(fields=["-created_at", "-id"], name="product_recent_idx"),
+        ]
         constraints = [
             CheckConstraint(check=Q(price__gt=0), name="product_price_gt_zero"),
             CheckConstraint(check=Q(stock__gt=0), name="product_stock_gt_zero"),
@@ -61,6 +91,14 @@ class Product(models.Model):
         return f"{self.sku} - {self.name}"
 
 
+def storage_key_from_url(url: str | None) -> str | None:
+    """Object key of an uploaded image, i.e. its URL path without the leading slash."""
+
+    if not url:
+        return None
+    return urlsplit(url).path.lstrip("/") or None
+
+
 class ProductImage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
@@ -69,6 +107,8 @@ class ProductImage(models.Model):
     is_cover = models.BooleanField(default=False)
     mime_type = models.CharField(max_length=64, null=True, blank=True)
     size_bytes = models.IntegerField(null=True, blank=True)
+    # Derived from url when the row is written so deletes need no URL parsing.
+    storage_key = models.TextField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ["position", "id"]
@@ -84,6 +124,14 @@ class ProductImage(models.Model):
     def __str__(self) -> str:
         return f"{self.product_id} - {self.url}"
 
+    def save(self, *args, **kwargs):
+        # Always re-derived so an edited url never leaves a stale key behind.
+        self.storage_key = storage_key_from_url(self.url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "url" in update_fields and "storage_key" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "storage_key"]
+        super().save(*args, **kwargs)
+
 
 class ProductFeature(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -99,6 +147,29 @@ class ProductFeature(models.Model):
         return self.label
 
 
+class PromotionQuerySet(models.QuerySet):
+    def current(self, moment=None):
+        """Active promotions whose window contains ``moment`` (default: now)."""
+
+        now = moment or timezone.now()
+        return (
+            self.filter(is_active=True)
+            .filter(Q(start_date__lte=now) | Q(start_date__isnull=True))
+            .filter(Q(end_date__gte=now) | Q(end_date__isnull=True))
+        )
+
+    def ending_soon(self, moment=None, window=timedelta(days=1)):
+        """Active promotions ending within ``window`` that were not announced yet."""
+
+        now = moment or timezone.now()
+        return self.filter(
+            is_active=True,
+            end_date__gt=now,
+            end_date__lte=now + window,
+            notified_ending__isnull=True,
+        )
+
+
 class Promotion(models.Model):
     class DiscountType(models.TextChoices):
         PERCENT = "PERCENT", "Porcentaje"
@@ -120,13 +191,21 @@ class Promotion(models.Model):
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    notified_ending = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PromotionQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Promocion"
         verbose_name_plural = "Promociones"
+        indexes = [
+            models.Index(fields=["is_active", "start_date", "end_date"], name="promo_active_window_idx"),
+            models.Index(fields=["start_date", "end_date"], condition=Q(is_active=True), name="promo_active_partial"),
+            models.Index(fields=["scope", "is_active"], name="promo_scope_active_idx"),
+        ]
         constraints = [
             CheckConstraint(check=Q(discount_value__gt=0), name="promotion_discount_gt_zero"),
             CheckConstraint(
@@ -153,11 +232,27 @@ class Promotion(models.Model):
             return False
         return True
 
+    def _related(self, name: str):
+        # Read prefetch_related() results directly instead of going through
+        # the related manager; fall back to one query per promotion.
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if name in prefetched:
+            return prefetched[name]
+        return getattr(self, name).all()
+
+    @cached_property
+    def _category_ids(self) -> set:
+        return {category.id for category in self._related("categories")}
+
+    @cached_property
+    def _product_ids(self) -> set:
+        return {product.id for product in self._related("products")}
+
     def applies_to_product(self, product: Product) -> bool:
         if self.scope == self.Scope.GLOBAL:
             return True
         if self.scope == self.Scope.CATEGORY and product.category_id:
-            return self.categories.filter(id=product.category_id).exists()
+            return product.category_id in self._category_ids
         if self.scope == self.Scope.PRODUCT:
-            return self.products.filter(id=product.id).exists()
+            return product.id in self._product_ids
         return False
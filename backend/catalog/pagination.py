@@ -0,0 +1,94 @@
+"""Pagination classes for catalog listings."""
+from __future__ import annotations
+
+import hashlib
+from functools import partial
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+# Shoppers page through the same few filter combinations, so their totals may
+# lag catalog edits by up to a minute.
+CATALOG_COUNT_CACHE_TTL = 60
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that reads ``count`` from the cache when given a key."""
+
+    def __init__(self, *args, count_cache_key: str | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.count_cache_key = count_cache_key
+
+    @cached_property
+    def count(self) -> int:
+        if self.count_cache_key is None:
+            return self._exact_count()
+        return cache.get_or_set(self.count_cache_key, self._exact_count, CATALOG_COUNT_CACHE_TTL)
+
+    def _exact_count(self) -> int:
+        return super().count
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Page numbers with a cached COUNT(*) for simple, frequently repeated filters.
+
+    Requests whose query parameters are all in ``count_cache_params`` (plus
+    paging and ordering) share a cached total. Anything else, like search or
+    an ids list, runs the exact COUNT.
+    """
+
+    django_paginator_class = CachedCountPaginator
+    count_cache_params: tuple[str, ...] = ("category_id", "is_active")
+    count_neutral_params: tuple[str, ...] = ("ordering",)
+
+    def get_count_cache_key(self, request, view=None) -> str | None:
+        params = request.query_params
+        ignored = {self.page_query_param, self.page_size_query_param, *self.count_neutral_params}
+        if any(name not in ignored and name not in self.count_cache_params for name in params):
+            return None
+        scope = getattr(view, "basename", None) or type(view).__name__
+        filters = "\x1f".join(params.get(name, "") for name in self.count_cache_params)
+        digest = hashlib.sha1(filters.encode()).hexdigest()
+        # Staff and shoppers see different rows for the same filters.
+        return f"catalog_count:{scope}:{int(bool(request.user.is_staff))}:{digest}"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        key = self.get_count_cache_key(request, view)
+        self.django_paginator_class = partial(CachedCountPaginator, count_cache_key=key)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ProductCursorPagination(CursorPagination):
+    """Keyset pages over the default newest-first ordering."""
+
+    ordering = "-created_at"
+    page_size = 50
+
+
+class ProductPagination(EstimatedCountPagination):
+    """Page numbers by default; keyset pages once the client sends ``cursor``.
+
+    Deep offset pages make PostgreSQL scan and discard every earlier row,
+    while a cursor page costs the same at any depth. Sending an empty
+    ``cursor`` starts from the first page.
+    """
+
+    cursor_query_param = "cursor"
+
+    def __init__(self) -> None:
+        self._cursor_paginator: ProductCursorPagination | None = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self._cursor_paginator = ProductCursorPagination()
+            self.display_page_controls = False
+            return self._cursor_paginator.paginate_queryset(queryset, request, view)
+        self._cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self._cursor_paginator is not None:
+            return self._cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
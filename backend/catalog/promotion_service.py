@@ -3,9 +3,14 @@ from __future__ import annotations
 from collections import defaultdict
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, Iterable, Sequence
+from functools import partial
+from itertools import chain
+from typing import Callable, Dict, Iterable, Sequence
+from uuid import UUID
 
-from django.db.models import Q
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db.models import F, Q
 from django.utils import timezone
 
 from .models import Product, Promotion
@@ -13,8 +18,39 @@ from .models import Product, Promotion
 
 DecimalLike = Decimal | int | float
 
+_EMPTY: tuple[Promotion, ...] = ()
 
-@dataclass
+# Promotion columns read by the pricing payload.
+PROMOTION_PRICING_FIELDS = (
+    "id",
+    "name",
+    "discount_type",
+    "discount_value",
+    "scope",
+    "description",
+    "start_date",
+    "end_date",
+)
+
+REFRESH_BATCH_SIZE = 500
+
+# Promotions change on admin-edit timescales, so catalog reads may share a
+# promotion snapshot for up to a minute.
+PROMOTION_PRICING_CACHE_TTL = 60
+
+# Which products have some current promotion; read on every has_promotion
+# catalog listing.
+ACTIVE_TARGETS_CACHE_TTL = 30
+
+# Lower wins when two promotions give the same discount.
+_SCOPE_PRIORITY = {
+    Promotion.Scope.PRODUCT: 0,
+    Promotion.Scope.CATEGORY: 1,
+    Promotion.Scope.GLOBAL: 2,
+}
+
+
+@dataclass(slots=True)
 class PromotionPricing:
     promotion: Promotion
     discount_per_unit: Decimal
@@ -28,44 +64,100 @@ class PromotionPricing:
             "discount_value": str(self.promotion.discount_value),
             "scope": self.promotion.scope,
             "description": self.promotion.description,
-            "start_date": self.promotion.start_date.isoformat() if self.promotion.start_date else None,
-            "end_date": self.promotion.end_date.isoformat() if self.promotion.end_date else None,
+            "start_date": self.promotion._start_iso,
+            "end_date": self.promotion._end_iso,
             "discount_amount": str(self.discount_per_unit),
             "final_price": str(self.final_price),
         }
 
 
-def _calculate_discount(unit_price: Decimal, promotion: Promotion) -> Decimal:
-    if unit_price <= 0:
-        return Decimal("0.00")
-    value = Decimal(promotion.discount_value)
-    if promotion.discount_type == Promotion.DiscountType.PERCENT:
-        discount = (unit_price * value) / Decimal("100")
-    else:
-        discount = value
-    if discount < 0:
-        discount = Decimal("0.00")
-    if discount > unit_price:
-        discount = unit_price
-    return discount.quantize(Decimal("0.01"))
+def _percent_discount(value_cents: int, price_cents: int) -> int:
+    """Percent discount in cents, rounded half-even like ``Decimal.quantize``."""
+
+    discount, remainder = divmod(price_cents * value_cents, 10000)
+    if remainder * 2 > 10000 or (remainder * 2 == 10000 and discount % 2):
+        discount += 1
+    return min(discount, price_cents)
+
+
+def _amount_discount(value_cents: int, price_cents: int) -> int:
+    return min(value_cents, price_cents)
+
+
+def _make_compute(promotion: Promotion) -> Callable[[int], int]:
+    # Specialized once per promotion so the per-product loop makes a single
+    # call with no type branch. partial() of module functions, unlike a
+    # closure, survives pickling into the pricing cache.
+    value_cents = int(Decimal(promotion.discount_value) * 100)
+    if promotion.discount_type == "PERCENT":
+        return partial(_percent_discount, value_cents)
+    return partial(_amount_discount, value_cents)
+
+
+def _set_public_window(promotion: Promotion) -> None:
+    promotion._start_iso = promotion.start_date.isoformat() if promotion.start_date else None
+    promotion._end_iso = promotion.end_date.isoformat() if promotion.end_date else None
+
+
+def stored_pricing(product: Product) -> PromotionPricing | None:
+    """Pricing read from the ``current_price``/``active_promotion`` columns.
+
+    Only meaningful once ``current_price`` has been filled in by
+    ``refresh_current_prices``; callers fall back to an engine while it is NULL.
+    """
+
+    promotion = product.active_promotion
+    if promotion is None or product.current_price is None:
+        return None
+    if not hasattr(promotion, "_start_iso"):
+        _set_public_window(promotion)
+    return PromotionPricing(
+        promotion=promotion,
+        discount_per_unit=product.price - product.current_price,
+        final_price=product.current_price,
+    )
+
+
+def _current_promotions(now):
+    return Promotion.objects.current(now).only(*PROMOTION_PRICING_FIELDS)
+
+
+Candidates = tuple[list[Promotion], Dict[UUID, list[Promotion]], Dict[UUID, list[Promotion]]]
 
 
 def _gather_candidates(
-    promotions: Sequence[Promotion],
-) -> tuple[list[Promotion], Dict[str, list[Promotion]], Dict[str, list[Promotion]]]:
-    global_promotions: list[Promotion] = []
-    category_map: Dict[str, list[Promotion]] = defaultdict(list)
-    product_map: Dict[str, list[Promotion]] = defaultdict(list)
-
-    for promotion in promotions:
-        if promotion.scope == Promotion.Scope.GLOBAL:
-            global_promotions.append(promotion)
-        elif promotion.scope == Promotion.Scope.CATEGORY:
-            for category in promotion.categories.all():
-                category_map[str(category.id)].append(promotion)
-        elif promotion.scope == Promotion.Scope.PRODUCT:
-            for product in promotion.products.all():
-                product_map[str(product.id)].append(promotion)
+    now,
+    category_ids: Iterable[UUID] | None,
+    product_ids: Iterable[UUID] | None,
+) -> Candidates:
+    """Current promotions by scope; ``None`` ids load every linked category/product."""
+
+    current = _current_promotions(now)
+    global_promotions = list(current.filter(scope=Promotion.Scope.GLOBAL))
+    category_map: Dict[UUID, list[Promotion]] = defaultdict(list)
+    product_map: Dict[UUID, list[Promotion]] = defaultdict(list)
+
+    # Scoped promotions come back once per matching link, carrying the linked
+    # id, so each scope joins only its own M2M table and nothing is prefetched.
+    scoped: dict[UUID, Promotion] = {}
+    for scope, relation, linked_ids, target in (
+        (Promotion.Scope.CATEGORY, "categories__id", category_ids, category_map),
+        (Promotion.Scope.PRODUCT, "products__id", product_ids, product_map),
+    ):
+        if linked_ids is not None and not linked_ids:
+            continue
+        rows = current.filter(scope=scope).annotate(linked_id=F(relation))
+        if linked_ids is not None:
+            rows = rows.filter(linked_id__in=linked_ids)
+        for row in rows:
+            # Unfiltered, a promotion without links comes back once with NULL.
+            if row.linked_id is not None:
+                target[row.linked_id].append(scoped.setdefault(row.id, row))
+
+    for promotion in chain(global_promotions, scoped.values()):
+        # Resolved once per promotion instead of once per priced product.
+        promotion._compute = _make_compute(promotion)
+        _set_public_window(promotion)
     return global_promotions, category_map, product_map
 
 
@@ -73,82 +165,217 @@ def _select_best_promotion(
     product: Product,
     candidates: Iterable[Promotion],
 ) -> PromotionPricing | None:
-    best: PromotionPricing | None = None
-    scope_priority = {
-        Promotion.Scope.PRODUCT: 0,
-        Promotion.Scope.CATEGORY: 1,
-        Promotion.Scope.GLOBAL: 2,
-    }
-    unit_price = Decimal(product.price)
+    price_cents = int(Decimal(product.price) * 100)
+    if price_cents <= 0:
+        return None
+    best: Promotion | None = None
+    best_discount = 0
     for promotion in candidates:
-        discount = _calculate_discount(unit_price, promotion)
+        discount = promotion._compute(price_cents)
         if discount <= 0:
             continue
-        final_price = unit_price - discount
-        pricing = PromotionPricing(
-            promotion=promotion,
-            discount_per_unit=discount,
-            final_price=final_price,
-        )
-        if best is None:
-            best = pricing
-            continue
-        if pricing.discount_per_unit > best.discount_per_unit:
-            best = pricing
+        if best is None or discount > best_discount:
+            best, best_discount = promotion, discount
+        elif discount == best_discount and _SCOPE_PRIORITY[promotion.scope] < _SCOPE_PRIORITY[best.scope]:
+            best = promotion
+        else:
             continue
-        if pricing.discount_per_unit == best.discount_per_unit:
-            if scope_priority[promotion.scope] < scope_priority[best.promotion.scope]:
-                best = pricing
-    return best
+        # A product-scoped promotion that makes the item free cannot be beaten
+        # on discount or on scope priority.
+        if best_discount == price_cents and best.scope == Promotion.Scope.PRODUCT:
+            break
+    if best is None:
+        return None
+    # Back to Decimal once per product, keeping the two decimal places.
+    return PromotionPricing(
+        promotion=best,
+        discount_per_unit=Decimal(best_discount).scaleb(-2),
+        final_price=Decimal(price_cents - best_discount).scaleb(-2),
+    )
 
 
-def build_promotion_pricing_map(products: Iterable[Product], moment=None) -> dict[str, PromotionPricing]:
+def build_promotion_pricing_map(products: Iterable[Product], moment=None) -> dict[UUID, PromotionPricing]:
     product_list = list(products)
     if not product_list:
         return {}
 
     now = moment or timezone.now()
-    product_ids = [product.id for product in product_list]
-    category_ids = {product.category_id for product in product_list if product.category_id}
-
-    promotions = (
-        Promotion.objects.filter(is_active=True)
-        .filter(Q(start_date__lte=now) | Q(start_date__isnull=True))
-        .filter(Q(end_date__gte=now) | Q(end_date__isnull=True))
-        .filter(
-            Q(scope=Promotion.Scope.GLOBAL)
-            | Q(scope=Promotion.Scope.CATEGORY, categories__id__in=category_ids)
-            | Q(scope=Promotion.Scope.PRODUCT, products__id__in=product_ids)
-        )
-        .distinct()
-        .prefetch_related("categories", "products")
+    product_ids = []
+    category_ids = set()
+    for product in product_list:
+        product_ids.append(product.id)
+        if product.category_id:
+            category_ids.add(product.category_id)
+
+    return _price_products(product_list, _gather_candidates(now, category_ids, product_ids))
+
+
+def _price_product(product: Product, candidates: Candidates) -> PromotionPricing | None:
+    global_promos, category_map, product_map = candidates
+    return _select_best_promotion(
+        product,
+        chain(
+            global_promos,
+            category_map.get(product.category_id, _EMPTY),
+            product_map.get(product.id, _EMPTY),
+        ),
     )
 
-    global_promos, category_map, product_map = _gather_candidates(list(promotions))
 
-    result: dict[str, PromotionPricing] = {}
-    for product in product_list:
-        candidates = []
-        candidates.extend(global_promos)
-        candidates.extend(category_map.get(str(product.category_id), []))
-        candidates.extend(product_map.get(str(product.id), []))
-        pricing = _select_best_promotion(product, candidates)
+def _price_products(products: Iterable[Product], candidates: Candidates) -> dict[UUID, PromotionPricing]:
+    result: dict[UUID, PromotionPricing] = {}
+    for product in products:
+        pricing = _price_product(product, candidates)
         if pricing:
-            result[str(product.id)] = pricing
+            result[product.id] = pricing
     return result
 
 
+_SNAPSHOT_CACHE_KEY = "promotion_pricing_snapshot"
+
+
+def current_promotion_snapshot(cache_ttl: int = PROMOTION_PRICING_CACHE_TTL) -> Candidates:
+    """Every current promotion with its links, shared across catalog requests.
+
+    Pricing from the snapshot needs no queries. Catalog signals delete it when
+    a promotion or its links change; with the Redis cache every process sees
+    that at once, while with the per-process LocMemCache fallback other
+    processes keep their copy for up to ``cache_ttl`` seconds.
+    """
+
+    return cache.get_or_set(_SNAPSHOT_CACHE_KEY, lambda: _gather_candidates(timezone.now(), None, None), cache_ttl)
+
+
+def invalidate_promotion_snapshot() -> None:
+    cache.delete(_SNAPSHOT_CACHE_KEY)
+
+
+def _store_current_prices(products: Sequence[Product], now) -> int:
+    pricing_map = build_promotion_pricing_map(products, moment=now)
+    changed: list[Product] = []
+    for product in products:
+        pricing = pricing_map.get(product.id)
+        current_price = pricing.final_price if pricing else product.price
+        promotion_id = pricing.promotion.id if pricing else None
+        if product.current_price != current_price or product.active_promotion_id != promotion_id:
+            product.current_price = current_price
+            product.active_promotion_id = promotion_id
+            changed.append(product)
+    Product.objects.bulk_update(changed, ["current_price", "active_promotion"])
+    return len(changed)
+
+
+def refresh_current_prices(product_ids: Iterable | None = None, moment=None) -> int:
+    """Recompute the denormalized ``current_price``/``active_promotion`` columns.
+
+    Returns the number of products whose stored values changed.
+    """
+
+    now = moment or timezone.now()
+    queryset = Product.objects.only("id", "category_id", "price", "current_price", "active_promotion_id").order_by("pk")
+    if product_ids is not None:
+        queryset = queryset.filter(id__in=list(product_ids))
+    updated = 0
+    batch: list[Product] = []
+    for product in queryset.iterator(chunk_size=REFRESH_BATCH_SIZE):
+        batch.append(product)
+        if len(batch) >= REFRESH_BATCH_SIZE:
+            updated += _store_current_prices(batch, now)
+            batch = []
+    if batch:
+        updated += _store_current_prices(batch, now)
+    return updated
+
+
+@dataclass(frozen=True, slots=True)
+class ActivePromotionTargets:
+    has_global: bool
+    category_ids: frozenset[UUID]
+    product_ids: frozenset[UUID]
+
+
+def _collect_active_targets(now) -> ActivePromotionTargets:
+    # One row per scope with the linked ids aggregated in PostgreSQL. The
+    # default ordering is cleared so it does not leak into the GROUP BY.
+    rows = (
+        _current_promotions(now)
+        .order_by()
+        .values("scope")
+        .annotate(
+            category_ids=ArrayAgg("categories__id", distinct=True, filter=Q(categories__isnull=False), default=[]),
+            product_ids=ArrayAgg("products__id", distinct=True, filter=Q(products__isnull=False), default=[]),
+        )
+    )
+    has_global = False
+    category_ids: frozenset[UUID] = frozenset()
+    product_ids: frozenset[UUID] = frozenset()
+    for row in rows:
+        scope = row["scope"]
+        if scope == Promotion.Scope.GLOBAL:
+            has_global = True
+        elif scope == Promotion.Scope.CATEGORY:
+            category_ids = frozenset(row["category_ids"])
+        elif scope == Promotion.Scope.PRODUCT:
+            product_ids = frozenset(row["product_ids"])
+    return ActivePromotionTargets(has_global, category_ids, product_ids)
+
+
+def active_promotion_targets(moment=None, cache_ttl: int | None = ACTIVE_TARGETS_CACHE_TTL) -> ActivePromotionTargets:
+    """Scopes of the promotions current at ``moment``, cached per minute."""
+
+    now = moment or timezone.now()
+    if not cache_ttl:
+        return _collect_active_targets(now)
+    return cache.get_or_set(
+        f"active_promotion_targets:{now:%Y%m%d%H%M}",
+        partial(_collect_active_targets, now),
+        cache_ttl,
+    )
+
+
 class PromotionPricingEngine:
-    """Caches promotion pricing lookups for a set of products."""
+    """Caches promotion pricing lookups for a set of products.
+
+    Given a ``promotions`` snapshot, products are priced from it without
+    queries, including ones first seen by ``get``.
+    """
 
-    def __init__(self, products: Iterable[Product], moment=None) -> None:
+    def __init__(
+        self,
+        products: Iterable[Product] = (),
+        moment=None,
+        promotions: Candidates | None = None,
+    ) -> None:
+        self._candidates = promotions
+        if promotions is not None:
+            self._map = _price_products(products, promotions)
+            self._priced = set(self._map)
+            return
         self._map = build_promotion_pricing_map(products, moment=moment)
 
-    def get(self, product: Product | str | None) -> PromotionPricing | None:
+    def get(self, product: Product | UUID | str | None) -> PromotionPricing | None:
         if product is None:
             return None
         if isinstance(product, Product):
-            key = str(product.id)
-        else:
-            key = str(product)
-        return self._map.get(key)
+            if self._candidates is not None and product.id not in self._priced:
+                self._priced.add(product.id)
+                pricing = _price_product(product, self._candidates)
+                if pricing:
+                    self._map[product.id] = pricing
+            return self._map.get(product.id)
+        if isinstance(product, UUID):
+            return self._map.get(product)
+        try:
+            return self._map.get(UUID(str(product)))
+        except ValueError:
+            return None
+
+    def get_many(self, products: Iterable[Product]) -> dict[UUID, PromotionPricing]:
+        """Pricing for every product that has an applicable promotion."""
+
+        result: dict[UUID, PromotionPricing] = {}
+        for product in products:
+            pricing = self.get(product)
+            if pricing:
+                result[product.id] = pricing
+        return result
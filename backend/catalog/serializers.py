@@ -1,22 +1,59 @@
 ﻿from __future__ import annotations
 
 import logging
-from urllib.parse import urlparse
+from collections import Counter, defaultdict
+from decimal import Decimal
 from typing import Iterable
 
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
 from django.conf import settings
 from django.db import transaction
-from decimal import Decimal
-
+from django.db.models import Prefetch
 from rest_framework import serializers
 
-from .models import Category, Product, ProductFeature, ProductImage, Promotion
-from .promotion_service import PromotionPricingEngine, build_promotion_pricing_map
+from .models import Category, Product, ProductFeature, ProductImage, Promotion, storage_key_from_url
+from .promotion_service import (
+    PROMOTION_PRICING_FIELDS,
+    PromotionPricingEngine,
+    current_promotion_snapshot,
+    stored_pricing,
+)
+from .tasks import delete_s3_objects
 
 logger = logging.getLogger(__name__)
 
+# Image columns compared when syncing an edited product's gallery. storage_key
+# is included so rows with a missing or stale key are corrected by the sync.
+IMAGE_SYNC_FIELDS = ["position", "is_cover", "mime_type", "size_bytes", "storage_key"]
+
+# Product columns read when rendering. Prices come from the denormalized
+# current_price/active_promotion columns kept by refresh_current_prices.
+PRODUCT_LOAD_FIELDS = [
+    "id",
+    "category_id",
+    "name",
+    "sku",
+    "short_description",
+    "long_description",
+    "price",
+    "current_price",
+    "active_promotion",
+    "stock",
+    "width_cm",
+    "height_cm",
+    "weight_kg",
+    "is_active",
+    "cover_image_url",
+    "created_at",
+    "updated_at",
+]
+
+_SCOPE_GLOBAL = Promotion.Scope.GLOBAL
+_SCOPE_CATEGORY = Promotion.Scope.CATEGORY
+_SCOPE_PRODUCT = Promotion.Scope.PRODUCT
+_DT_PERCENT = Promotion.DiscountType.PERCENT
+_ZERO = Decimal("0")
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -72,6 +109,25 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "cover_image_url", "created_at", "updated_at"]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the category and load only the columns rendered."""
+
+        return queryset.select_related("category", "active_promotion").only(
+            *PRODUCT_LOAD_FIELDS,
+            "category__id",
+            "category__name",
+            *(f"active_promotion__{field}" for field in PROMOTION_PRICING_FIELDS),
+        ).prefetch_related(
+            Prefetch(
+                "images",
+                queryset=ProductImage.objects.only(
+                    "id", "product_id", "url", "position", "is_cover", "mime_type", "size_bytes"
+                ),
+            ),
+            Prefetch("features", queryset=ProductFeature.objects.only("id", "product_id", "label")),
+        )
+
     def validate_price(self, value):
         if value <= 0:
             raise serializers.ValidationError("El precio debe ser mayor que 0.")
@@ -88,6 +144,10 @@ class ProductSerializer(serializers.ModelSerializer):
             cover_count = sum(1 for image in images if image.get("is_cover"))
             if cover_count > 1:
                 raise serializers.ValidationError("Solo una imagen puede marcarse como portada.")
+            # Images are synced and deleted from S3 by URL, so each one must be unique.
+            urls = [image.get("url") for image in images]
+            if len(set(urls)) != len(urls):
+                raise serializers.ValidationError({"images": "No se puede repetir la misma URL de imagen."})
         return attrs
 
     def _extract_nested(self, validated_data: dict) -> tuple[list[dict], list[dict]]:
@@ -95,96 +155,141 @@ class ProductSerializer(serializers.ModelSerializer):
         features = validated_data.pop("features", [])
         return images, features
 
-    def _prepare_images(self, images: Iterable[dict]) -> list[dict]:
-        prepared: list[dict] = []
+    def _prepare_images(self, images: Iterable[dict]) -> list[ProductImage]:
+        """Unsaved images; the owning product is attached right before saving."""
+
+        prepared: list[ProductImage] = []
         for image in images:
-            size_value = image.get("size_bytes")
-            if size_value in ("", None):
-                size_value = None
-            mime_value = image.get("mime_type")
-            if mime_value in ("", None):
-                mime_value = None
+            get = image.get
+            url = get("url")
             prepared.append(
-                {
-                    "url": image.get("url"),
-                    "position": image.get("position", 0),
-                    "is_cover": image.get("is_cover", False),
-                    "mime_type": mime_value,
-                    "size_bytes": size_value,
-                }
+                ProductImage(
+                    url=url,
+                    storage_key=storage_key_from_url(url),
+                    position=get("position", 0),
+                    is_cover=get("is_cover", False),
+                    # Blank strings and zero sizes are stored as unknown.
+                    mime_type=get("mime_type") or None,
+                    size_bytes=get("size_bytes") or None,
+                )
             )
-        prepared.sort(key=lambda item: (item["position"], item["url"]))
+        # Clients usually send the gallery already in position order.
+        if any((prev.position, prev.url) > (item.position, item.url) for prev, item in zip(prepared, prepared[1:])):
+            prepared.sort(key=lambda item: (item.position, item.url))
         return prepared
 
     def _prepare_features(self, features: Iterable[dict]) -> list[dict]:
         return [{"label": feature.get("label")} for feature in features if feature.get("label")]
 
-    def _sync_cover(self, product: Product, images_data: list[dict]) -> str | None:
+    def _sync_cover(self, images_data: list[ProductImage]) -> str | None:
         cover_url = None
         if not images_data:
             return None
-        cover_candidates = [img for img in images_data if img["is_cover"]]
+        cover_candidates = [img for img in images_data if img.is_cover]
         if not cover_candidates:
-            images_data[0]["is_cover"] = True
+            images_data[0].is_cover = True
             cover_candidates = [images_data[0]]
-        cover_url = cover_candidates[0]["url"]
+        cover_url = cover_candidates[0].url
         return cover_url
 
-    def _extract_storage_key(self, url: str | None) -> str | None:
-        if not url:
-            return None
-        parsed = urlparse(url)
-        key = parsed.path.lstrip("/")
-        return key or None
-
-    def _delete_removed_objects(self, previous_urls: list[str], current_images: list[dict]) -> None:
-        if not settings.AWS_S3_BUCKET:
+    def _delete_removed_objects(self, removed_keys: list[str | None]) -> None:
+        if not removed_keys or not settings.AWS_S3_BUCKET:
             return
-        remaining_urls = {image.get("url") for image in current_images if image.get("url")}
-        urls_to_delete = [url for url in previous_urls if url and url not in remaining_urls]
-        keys = [self._extract_storage_key(url) for url in urls_to_delete if url]
+        keys = [key for key in removed_keys if key]
         if not keys:
             return
-        try:
-            s3_client = boto3.client(
-                "s3",
-                region_name=settings.AWS_REGION,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            )
-            for key in keys:
-                s3_client.delete_object(Bucket=settings.AWS_S3_BUCKET, Key=key)
-        except (BotoCoreError, ClientError) as error:
-            logger.warning("No se pudo eliminar imagenes antiguas de S3: %s", error)
+        # S3 is only touched once the new image list is committed, and from a
+        # worker rather than the request.
+        transaction.on_commit(lambda: delete_s3_objects.delay(keys))
 
-    def _replace_nested(self, product: Product, images: list[dict], features: list[dict]) -> None:
-        previous_urls = list(product.images.values_list("url", flat=True))
-        product.images.all().delete()
-        product.features.all().delete()
-
-        cover_url = self._sync_cover(product, images)
+    def _create_nested(self, product: Product, images: list[ProductImage], features: list[dict]) -> None:
+        # No per-row signals are registered for images or features.
         for image in images:
-            ProductImage.objects.create(product=product, **image)
-        for feature in features:
-            ProductFeature.objects.create(product=product, **feature)
-
-        product.cover_image_url = cover_url
-        product.save(update_fields=["cover_image_url", "updated_at"])
-        self._delete_removed_objects(previous_urls, images)
+            image.product = product
+        ProductImage.objects.bulk_create(images, batch_size=500)
+        ProductFeature.objects.bulk_create(
+            [ProductFeature(product=product, **feature) for feature in features], batch_size=500
+        )
+
+    def _sync_images(self, product: Product, images: list[ProductImage]) -> list[str | None]:
+        """Apply only the image rows that changed; returns the removed storage keys."""
+
+        existing: dict[str, ProductImage] = {}
+        duplicate_ids = []
+        for image in ProductImage.objects.filter(product=product):
+            # Rows saved before URLs had to be unique: keep one per URL.
+            if existing.setdefault(image.url, image) is not image:
+                duplicate_ids.append(image.pk)
+        incoming = {image.url: image for image in images}
+
+        removed_urls = [url for url in existing if url not in incoming]
+        removed_ids = [existing[url].pk for url in removed_urls] + duplicate_ids
+        if removed_ids:
+            ProductImage.objects.filter(pk__in=removed_ids).delete()
+
+        to_add: list[ProductImage] = []
+        to_update: list[ProductImage] = []
+        for url, data in incoming.items():
+            current = existing.get(url)
+            if current is None:
+                data.product = product
+                to_add.append(data)
+            elif any(getattr(current, field) != getattr(data, field) for field in IMAGE_SYNC_FIELDS):
+                for field in IMAGE_SYNC_FIELDS:
+                    setattr(current, field, getattr(data, field))
+                to_update.append(current)
+        ProductImage.objects.bulk_create(to_add, batch_size=500)
+        ProductImage.objects.bulk_update(to_update, IMAGE_SYNC_FIELDS, batch_size=500)
+        return [existing[url].storage_key for url in removed_urls]
+
+    def _sync_features(self, product: Product, features: list[dict]) -> None:
+        # Labels are compared as a multiset so repeated labels round-trip.
+        existing: dict[str, list] = defaultdict(list)
+        for pk, label in ProductFeature.objects.filter(product=product).values_list("id", "label"):
+            existing[label].append(pk)
+        incoming = Counter(feature["label"] for feature in features)
+
+        removed_ids = []
+        to_add = []
+        for label in existing.keys() | incoming.keys():
+            ids = existing.get(label, [])
+            wanted = incoming[label]
+            removed_ids.extend(ids[wanted:])
+            to_add.extend(ProductFeature(product=product, label=label) for _ in range(wanted - len(ids)))
+        if removed_ids:
+            ProductFeature.objects.filter(pk__in=removed_ids).delete()
+        ProductFeature.objects.bulk_create(to_add, batch_size=500)
+
+    def _replace_nested(self, product: Product, images: list[ProductImage], features: list[dict]) -> None:
+        cover_url = self._sync_cover(images)
+        removed_keys = self._sync_images(product, images)
+        self._sync_features(product, features)
+
+        if product.cover_image_url != cover_url:
+            product.cover_image_url = cover_url
+            product.save(update_fields=["cover_image_url", "updated_at"])
+        self._delete_removed_objects(removed_keys)
 
     @transaction.atomic
     def create(self, validated_data):
         images_raw, features_raw = self._extract_nested(validated_data)
-        product = Product.objects.create(**validated_data)
         images = self._prepare_images(images_raw)
         features = self._prepare_features(features_raw)
-        self._replace_nested(product, images, features)
+        # A new product has nothing to replace, so the cover goes into the INSERT.
+        product = Product.objects.create(cover_image_url=self._sync_cover(images), **validated_data)
+        self._create_nested(product, images, features)
         return product
 
     @transaction.atomic
     def update(self, instance, validated_data):
         images_raw, features_raw = self._extract_nested(validated_data)
+        if any(
+            field in validated_data and validated_data[field] != getattr(instance, field)
+            for field in ("price", "category")
+        ):
+            # The stored price is stale until the post-commit refresh runs.
+            instance.current_price = None
+            instance.active_promotion = None
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -196,11 +301,16 @@ class ProductSerializer(serializers.ModelSerializer):
         return instance
 
     def _get_pricing(self, obj: Product):
-        engine: PromotionPricingEngine | None = self.context.get("promotion_pricing")
-        if engine:
-            return engine.get(obj)
-        single_engine = PromotionPricingEngine([obj])
-        return single_engine.get(obj)
+        if obj.current_price is not None:
+            return stored_pricing(obj)
+        # Products created or repriced since the last refresh have no stored
+        # price yet; only those are priced on the fly, from one snapshot
+        # engine shared by every row the serializer renders.
+        engine: PromotionPricingEngine | None = self.__dict__.get("_snapshot_engine")
+        if engine is None:
+            logger.debug("Producto %s sin current_price; calculando desde promociones vigentes", obj.pk)
+            engine = self._snapshot_engine = PromotionPricingEngine(promotions=current_promotion_snapshot())
+        return engine.get(obj)
 
     def get_active_promotion(self, obj: Product):
         pricing = self._get_pricing(obj)
@@ -209,6 +319,8 @@ class ProductSerializer(serializers.ModelSerializer):
         return pricing.as_public_dict()
 
     def get_final_price(self, obj: Product) -> str:
+        if obj.current_price is not None:
+            return str(obj.current_price)
         pricing = self._get_pricing(obj)
         if pricing:
             return str(pricing.final_price)
@@ -218,8 +330,8 @@ class ProductSerializer(serializers.ModelSerializer):
 class PromotionSerializer(serializers.ModelSerializer):
     categories = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), many=True, required=False)
     products = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), many=True, required=False)
-    category_names = serializers.SerializerMethodField()
-    product_names = serializers.SerializerMethodField()
+    category_names = serializers.SlugRelatedField(source="categories", slug_field="name", many=True, read_only=True)
+    product_names = serializers.SlugRelatedField(source="products", slug_field="name", many=True, read_only=True)
 
     class Meta:
         model = Promotion
@@ -242,42 +354,78 @@ class PromotionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "created_at", "updated_at", "category_names", "product_names"]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Prefetch the relations rendered as ids and names (two queries total)."""
+
+        return queryset.prefetch_related(
+            Prefetch("categories", queryset=Category.objects.only("id", "name")),
+            Prefetch("products", queryset=Product.objects.only("id", "name")),
+        )
+
     def validate(self, attrs):
-        scope = attrs.get("scope") or getattr(self.instance, "scope", Promotion.Scope.GLOBAL)
-        categories = attrs.get("categories")
-        products = attrs.get("products")
-        discount_type = attrs.get("discount_type") or getattr(self.instance, "discount_type", Promotion.DiscountType.PERCENT)
-        discount_value: Decimal = attrs.get("discount_value") or getattr(self.instance, "discount_value", Decimal("0"))
-        start = attrs.get("start_date") or getattr(self.instance, "start_date", None)
-        end = attrs.get("end_date") or getattr(self.instance, "end_date", None)
+        instance = self.instance
+        if instance is None:
+            scope, discount_type, discount_value, start, end = _SCOPE_GLOBAL, _DT_PERCENT, _ZERO, None, None
+        else:
+            scope, discount_type, discount_value, start, end = (
+                instance.scope,
+                instance.discount_type,
+                instance.discount_value,
+                instance.start_date,
+                instance.end_date,
+            )
+        get = attrs.get
+        scope = get("scope") or scope
+        discount_type = get("discount_type") or discount_type
+        discount_value = get("discount_value") or discount_value
+        start = get("start_date") or start
+        end = get("end_date") or end
+        categories = get("categories")
+        products = get("products")
 
         if discount_value <= 0:
             raise serializers.ValidationError({"discount_value": "El valor del descuento debe ser mayor a 0."})
-        if discount_type == Promotion.DiscountType.PERCENT and discount_value > 100:
+        if discount_type == _DT_PERCENT and discount_value > 100:
             raise serializers.ValidationError({"discount_value": "El porcentaje no puede superar el 100%."})
 
         if end and start and end <= start:
             raise serializers.ValidationError({"end_date": "La fecha de fin debe ser posterior al inicio."})
 
-        if scope == Promotion.Scope.CATEGORY and not categories:
+        if scope == _SCOPE_CATEGORY and not categories:
             raise serializers.ValidationError({"categories": "Selecciona al menos una categoria."})
-        if scope == Promotion.Scope.PRODUCT and not products:
+        if scope == _SCOPE_PRODUCT and not products:
             raise serializers.ValidationError({"products": "Selecciona al menos un producto."})
         return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
         categories = validated_data.pop("categories", [])
         products = validated_data.pop("products", [])
         promotion = Promotion.objects.create(**validated_data)
-        if promotion.scope == Promotion.Scope.CATEGORY and categories:
-            promotion.categories.set(categories)
-        if promotion.scope == Promotion.Scope.PRODUCT and products:
-            promotion.products.set(products)
+        # The new promotion has no links yet, so the through rows are inserted
+        # directly instead of going through set()'s diff. Its post_save already
+        # schedules the price refresh that m2m_changed would have triggered.
+        if promotion.scope == _SCOPE_CATEGORY and categories:
+            through = Promotion.categories.through
+            through.objects.bulk_create(
+                [through(promotion_id=promotion.id, category_id=category.id) for category in categories],
+                ignore_conflicts=True,
+            )
+        if promotion.scope == _SCOPE_PRODUCT and products:
+            through = Promotion.products.through
+            through.objects.bulk_create(
+                [through(promotion_id=promotion.id, product_id=product.id) for product in products],
+                ignore_conflicts=True,
+            )
         return promotion
 
     def update(self, instance, validated_data):
         categories = validated_data.pop("categories", None)
         products = validated_data.pop("products", None)
+        if "end_date" in validated_data and validated_data["end_date"] != instance.end_date:
+            # A new end date gets its own "ending soon" notice.
+            instance.notified_ending = None
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -292,14 +440,3 @@ class PromotionSerializer(serializers.ModelSerializer):
             else:
                 instance.products.clear()
         return instance
-
-    def get_category_names(self, obj: Promotion):
-        return [category.name for category in obj.categories.all()]
-
-    def get_product_names(self, obj: Promotion):
-        return [product.name for product in obj.products.all()]
-
-
-
-
-
@@ -1,18 +1,18 @@
 """Signals for catalog app."""
 from __future__ import annotations
 
-from datetime import timedelta
 import logging
 
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from django.utils import timezone
 
 from notifications.models import UserNotification
 from notifications.services import send_push_to_all
 
 from .models import Promotion, Product
+from .promotion_service import invalidate_promotion_snapshot
+from .tasks import refresh_product_prices
 
 LOGGER = logging.getLogger(__name__)
 
@@ -32,21 +32,12 @@ def _schedule_promotion_notification(instance: Promotion, title: str, body: str)
 
 @receiver(post_save, sender=Promotion)
 def promotion_push_notifications(sender, instance: Promotion, created: bool, **kwargs):
-    if not instance.is_active:
+    # "Ending soon" notices are sent by catalog.tasks.notify_ending_promotions.
+    if not created or not instance.is_active:
         return
-    title = None
-    body = None
-    if created:
-        title = f"Nueva promocion: {instance.name}"
-        body = instance.description[:120] if instance.description else "Aprovecha antes de que termine."
-    else:
-        if instance.end_date:
-            now = timezone.now()
-            if instance.end_date > now and instance.end_date - now <= timedelta(days=1):
-                title = f"La promo '{instance.name}' vence pronto"
-                body = "Tienes menos de 24h para aprovechar este descuento."
-    if title and body:
-        _schedule_promotion_notification(instance, title, body)
+    title = f"Nueva promocion: {instance.name}"
+    body = instance.description[:120] if instance.description else "Aprovecha antes de que termine."
+    _schedule_promotion_notification(instance, title, body)
 
 
 @receiver(post_save, sender=Product)
@@ -63,3 +54,34 @@ def product_recommendation_notification(sender, instance: Product, created: bool
         )
 
     transaction.on_commit(_send)
+
+
+def _schedule_price_refresh(product_ids: list[str] | None = None) -> None:
+    transaction.on_commit(lambda: refresh_product_prices.delay(product_ids))
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def promotion_refresh_prices(sender, instance: Promotion, **kwargs):
+    transaction.on_commit(invalidate_promotion_snapshot)
+    _schedule_price_refresh()
+
+
+@receiver(m2m_changed, sender=Promotion.categories.through)
+@receiver(m2m_changed, sender=Promotion.products.through)
+def promotion_scope_refresh_prices(sender, action: str, **kwargs):
+    if action in {"post_add", "post_remove", "post_clear"}:
+        transaction.on_commit(invalidate_promotion_snapshot)
+        _schedule_price_refresh()
+
+
+# Only these columns change which promotion applies or what it costs.
+_PRICE_INPUT_FIELDS = frozenset({"price", "category", "category_id"})
+
+
+@receiver(post_save, sender=Product)
+def product_refresh_price(sender, instance: Product, update_fields=None, **kwargs):
+    # Stock decrements and cover-image saves name their columns and skip this.
+    if update_fields is not None and not _PRICE_INPUT_FIELDS.intersection(update_fields):
+        return
+    _schedule_price_refresh([str(instance.id)])
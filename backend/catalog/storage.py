@@ -0,0 +1,121 @@
+"""S3 access shared by the catalog views and serializers."""
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from uuid import uuid4
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# DeleteObjects accepts at most 1000 keys per request.
+S3_DELETE_BATCH_SIZE = 1000
+
+# Matches the product_image_max_size check on ProductImage.size_bytes.
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+PRESIGNED_UPLOAD_EXPIRES = 300
+
+# Photos above 16 MiB go up as 32 MiB parts in parallel instead of boto3's
+# 8 MiB defaults.
+S3_UPLOAD_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=32 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+)
+
+# The shared client serves concurrent request threads and the multipart
+# upload workers, so its pool is sized above botocore's default of 10.
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+)
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """Process-wide S3 client; building one parses the service model each time."""
+
+    return boto3.client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        config=S3_CLIENT_CONFIG,
+    )
+
+
+def delete_objects(keys: list[str]) -> None:
+    """Delete ``keys`` from the catalog bucket in batched requests."""
+
+    if not keys or not settings.AWS_S3_BUCKET:
+        return
+    try:
+        s3_client = get_s3_client()
+        key_iter = iter(keys)
+        while chunk := list(islice(key_iter, S3_DELETE_BATCH_SIZE)):
+            s3_client.delete_objects(
+                Bucket=settings.AWS_S3_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+            )
+    except (BotoCoreError, ClientError) as error:
+        logger.warning("No se pudo eliminar imagenes antiguas de S3: %s", error)
+
+
+def build_object_key(prefix: str, filename: str) -> str:
+    """Random key under ``prefix/`` keeping the original file extension."""
+
+    return f"{prefix}/{uuid4()}{Path(filename).suffix.lower()}"
+
+
+def public_url_for(object_key: str) -> str:
+    public_base = (settings.AWS_S3_PUBLIC_DOMAIN or "").rstrip("/")
+    return f"{public_base}/{object_key}" if public_base else object_key
+
+
+def upload_acl() -> str | None:
+    acl_value = (settings.AWS_S3_UPLOAD_ACL or "").strip()
+    if acl_value and acl_value.lower() not in {"none", "default"}:
+        return acl_value
+    return None
+
+
+def presign_image_upload(prefix: str, filename: str, content_type: str) -> dict:
+    """Presigned POST letting the browser upload one image straight to the bucket."""
+
+    object_key = build_object_key(prefix, filename)
+    fields = {"Content-Type": content_type}
+    conditions: list = [
+        {"Content-Type": content_type},
+        ["content-length-range", 0, MAX_IMAGE_BYTES],
+    ]
+    acl_value = upload_acl()
+    if acl_value:
+        fields["acl"] = acl_value
+        conditions.append({"acl": acl_value})
+    presigned = get_s3_client().generate_presigned_post(
+        Bucket=settings.AWS_S3_BUCKET,
+        Key=object_key,
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRES,
+    )
+    return {
+        "upload_url": presigned["url"],
+        "fields": presigned["fields"],
+        "key": object_key,
+        "url": public_url_for(object_key),
+        "mime_type": content_type,
+        "max_size_bytes": MAX_IMAGE_BYTES,
+        "expires_in": PRESIGNED_UPLOAD_EXPIRES,
+    }
@@ -0,0 +1,59 @@
+"""Background tasks for the catalog."""
+from __future__ import annotations
+
+import logging
+
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import UserNotification
+from notifications.services import send_push_to_all
+
+from .models import Promotion
+from .promotion_service import refresh_current_prices
+from .storage import delete_objects
+
+LOGGER = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def refresh_product_prices(product_ids: list[str] | None = None) -> int:
+    """Recompute stored current prices for the given products (default: all)."""
+
+    return refresh_current_prices(product_ids)
+
+
+@shared_task(ignore_result=True)
+def delete_s3_objects(keys: list[str]) -> None:
+    """Remove replaced product images from S3 outside the request."""
+
+    delete_objects(keys)
+
+
+@shared_task(ignore_result=True)
+def notify_ending_promotions() -> int:
+    """Announce promotions with less than 24h left, once per promotion."""
+
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets overlapping beat runs split the work instead of
+        # announcing the same promotion twice.
+        promotions = list(
+            Promotion.objects.ending_soon(now)
+            .select_for_update(skip_locked=True)
+            .only("id", "name")
+        )
+        if not promotions:
+            return 0
+        Promotion.objects.filter(pk__in=[promotion.pk for promotion in promotions]).update(notified_ending=now)
+
+    for promotion in promotions:
+        LOGGER.info("Enviando aviso de fin de promocion %s", promotion.id)
+        send_push_to_all(
+            f"La promo '{promotion.name}' vence pronto",
+            "Tienes menos de 24h para aprovechar este descuento.",
+            data={"promotion_id": str(promotion.id), "type": "promotion"},
+            category=UserNotification.Category.PROMOTION,
+        )
+    return len(promotions)
@@ -1,12 +1,18 @@
 ﻿"""Catalog API tests."""
-from decimal import Decimal
+from decimal import ROUND_HALF_EVEN, Decimal
+from types import SimpleNamespace
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 
-from catalog.models import Category, Product, ProductImage
+from catalog.models import Category, Product, ProductFeature, ProductImage, Promotion
+from catalog.pagination import EstimatedCountPagination
+from catalog.promotion_service import _percent_discount, build_promotion_pricing_map, refresh_current_prices
 
 
 class ProductAPITests(APITestCase):
@@ -22,16 +28,8 @@ class ProductAPITests(APITestCase):
         )
         self.category = Category.objects.create(name="Electro", description="Electrodomesticos")
 
-    def _get_token(self) -> str:
-        response = self.client.post(
-            reverse("token_obtain_pair"),
-            {"email": self.admin_email, "password": self.admin_password},
-            format="json",
-        )
-        return response.data["access"]
-
     def test_create_product_with_nested_relations(self):
-        token = self._get_token()
+        self.client.force_authenticate(user=self.admin)
         url = reverse("product-list")
         payload = {
             "category": str(self.category.id),
@@ -54,12 +52,7 @@ class ProductAPITests(APITestCase):
                 {"label": "Motor inverter"},
             ],
         }
-        response = self.client.post(
-            url,
-            payload,
-            format="json",
-            HTTP_AUTHORIZATION=f"Bearer {token}",
-        )
+        response = self.client.post(url, payload, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
         product = Product.objects.get(sku="LAVA-1234")
         self.assertEqual(product.images.count(), 2)
@@ -97,3 +90,253 @@ class ProductAPITests(APITestCase):
         skus = [item["sku"] for item in response.data["results"]]
         self.assertIn(active_product.sku, skus)
         self.assertNotIn(inactive_product.sku, skus)
+
+    def test_product_list_switches_to_cursor_pages_on_request(self):
+        for index in range(3):
+            Product.objects.create(
+                category=self.category,
+                name=f"Producto {index}",
+                sku=f"PROD-CUR{index}",
+                price=Decimal("10.00"),
+                stock=1,
+                is_active=True,
+            )
+
+        response = self.client.get(reverse("product-list"), {"cursor": ""}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIn("next", response.data)
+        self.assertEqual(len(response.data["results"]), 3)
+
+
+class PercentDiscountTests(SimpleTestCase):
+    def test_matches_decimal_half_even_rounding(self):
+        for price_cents in (1, 50, 150, 250, 999, 1999, 12345):
+            for value_cents in (100, 150, 1250, 3333, 5000, 10000):
+                expected = (Decimal(price_cents) * Decimal(value_cents) / Decimal(1000000)).quantize(
+                    Decimal("0.01"), rounding=ROUND_HALF_EVEN
+                )
+                self.assertEqual(
+                    _percent_discount(value_cents, price_cents),
+                    int(expected * 100),
+                    (price_cents, value_cents),
+                )
+
+    def test_never_exceeds_price(self):
+        self.assertEqual(_percent_discount(10000, 1999), 1999)
+
+
+class PromotionPricingTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Electro", description="Electrodomesticos")
+        self.product = Product.objects.create(
+            category=self.category,
+            name="Refrigerador",
+            sku="REF-100",
+            price=Decimal("100.00"),
+            stock=1,
+            is_active=True,
+        )
+
+    def test_tie_goes_to_the_narrower_scope(self):
+        Promotion.objects.create(name="Global", discount_type="PERCENT", discount_value=Decimal("10"))
+        category_promo = Promotion.objects.create(
+            name="Categoria",
+            discount_type="AMOUNT",
+            discount_value=Decimal("10.00"),
+            scope=Promotion.Scope.CATEGORY,
+        )
+        category_promo.categories.add(self.category)
+
+        pricing = build_promotion_pricing_map([self.product])[self.product.id]
+        self.assertEqual(pricing.promotion, category_promo)
+        self.assertEqual(pricing.discount_per_unit, Decimal("10.00"))
+        self.assertEqual(pricing.final_price, Decimal("90.00"))
+
+    def test_largest_discount_wins_and_keeps_two_decimals(self):
+        Promotion.objects.create(name="Global", discount_type="AMOUNT", discount_value=Decimal("5.00"))
+        product_promo = Promotion.objects.create(
+            name="Producto",
+            discount_type="PERCENT",
+            discount_value=Decimal("12.50"),
+            scope=Promotion.Scope.PRODUCT,
+        )
+        product_promo.products.add(self.product)
+
+        pricing = build_promotion_pricing_map([self.product])[self.product.id]
+        self.assertEqual(pricing.promotion, product_promo)
+        self.assertEqual(str(pricing.discount_per_unit), "12.50")
+        self.assertEqual(str(pricing.final_price), "87.50")
+
+    def test_amount_discount_is_capped_at_price(self):
+        Promotion.objects.create(name="Global", discount_type="AMOUNT", discount_value=Decimal("150.00"))
+
+        pricing = build_promotion_pricing_map([self.product])[self.product.id]
+        self.assertEqual(pricing.final_price, Decimal("0.00"))
+
+
+    def test_only_price_inputs_schedule_a_refresh(self):
+        with mock.patch("catalog.signals.refresh_product_prices") as refresh_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.stock = 0
+                self.product.save(update_fields=["stock"])
+            refresh_task.delay.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.price = Decimal("90.00")
+                self.product.save(update_fields=["price"])
+            refresh_task.delay.assert_called_once_with([str(self.product.id)])
+
+    def test_stored_current_price_is_served(self):
+        promotion = Promotion.objects.create(name="Global", discount_type="PERCENT", discount_value=Decimal("20"))
+
+        self.assertEqual(refresh_current_prices(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_price, Decimal("80.00"))
+        self.assertEqual(self.product.active_promotion_id, promotion.id)
+
+        data = self.client.get(reverse("product-detail", args=[self.product.id])).json()
+        self.assertEqual(data["final_price"], "80.00")
+        self.assertEqual(data["active_promotion"]["id"], str(promotion.id))
+        self.assertEqual(data["active_promotion"]["discount_amount"], "20.00")
+
+
+class ProductGallerySyncTests(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user(
+            email="admin@example.com",
+            password="Admin123!",
+            role="ADMIN",
+            is_staff=True,
+            is_email_verified=True,
+        )
+        self.client.force_authenticate(user=self.admin)
+        category = Category.objects.create(name="Electro", description="Electrodomesticos")
+        self.product = Product.objects.create(
+            category=category,
+            name="Horno",
+            sku="HORNO-1",
+            price=Decimal("250.00"),
+            stock=2,
+            is_active=True,
+        )
+        self.url = reverse("product-detail", args=[self.product.id])
+
+    def _patch(self, payload):
+        return self.client.patch(self.url, payload, format="json")
+
+    def test_unchanged_images_keep_their_rows(self):
+        kept = ProductImage.objects.create(product=self.product, url="https://cdn.test/a.jpg", position=0, is_cover=True)
+        dropped = ProductImage.objects.create(product=self.product, url="https://cdn.test/b.jpg", position=1)
+
+        response = self._patch(
+            {
+                "images": [
+                    {"url": "https://cdn.test/a.jpg", "position": 1, "is_cover": True},
+                    {"url": "https://cdn.test/c.jpg", "position": 0},
+                ]
+            }
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        images = {image.url: image for image in self.product.images.all()}
+        self.assertEqual(set(images), {"https://cdn.test/a.jpg", "https://cdn.test/c.jpg"})
+        self.assertEqual(images["https://cdn.test/a.jpg"].pk, kept.pk)
+        self.assertEqual(images["https://cdn.test/a.jpg"].position, 1)
+        self.assertFalse(ProductImage.objects.filter(pk=dropped.pk).exists())
+
+    def test_duplicate_image_urls_are_rejected(self):
+        response = self._patch(
+            {
+                "images": [
+                    {"url": "https://cdn.test/a.jpg", "position": 0},
+                    {"url": "https://cdn.test/a.jpg", "position": 1},
+                ]
+            }
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("images", response.data)
+
+    def test_legacy_duplicate_image_rows_are_pruned(self):
+        ProductImage.objects.create(product=self.product, url="https://cdn.test/a.jpg", position=0)
+        ProductImage.objects.create(product=self.product, url="https://cdn.test/a.jpg", position=1)
+
+        response = self._patch({"images": [{"url": "https://cdn.test/a.jpg", "position": 0}]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.product.images.count(), 1)
+
+    def test_repeated_feature_labels_round_trip(self):
+        kept = ProductFeature.objects.create(product=self.product, label="Inox")
+        ProductFeature.objects.create(product=self.product, label="Grill")
+
+        response = self._patch({"features": [{"label": "Inox"}, {"label": "Inox"}, {"label": "Turbo"}]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        labels = sorted(self.product.features.values_list("label", flat=True))
+        self.assertEqual(labels, ["Inox", "Inox", "Turbo"])
+        self.assertTrue(ProductFeature.objects.filter(pk=kept.pk).exists())
+
+        response = self._patch({"features": [{"label": "Inox"}]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(list(self.product.features.values_list("label", flat=True)), ["Inox"])
+
+    def test_storage_key_follows_the_url(self):
+        image = ProductImage.objects.create(product=self.product, url="https://cdn.test/products/a.jpg")
+        self.assertEqual(image.storage_key, "products/a.jpg")
+
+        image.url = "https://cdn.test/products/b.jpg"
+        image.save(update_fields=["url"])
+
+        image.refresh_from_db()
+        self.assertEqual(image.storage_key, "products/b.jpg")
+
+    @override_settings(AWS_S3_BUCKET="smartsales-test")
+    def test_removed_images_are_deleted_from_s3_after_commit(self):
+        ProductImage.objects.create(product=self.product, url="https://cdn.test/products/a.jpg", is_cover=True)
+        ProductImage.objects.create(product=self.product, url="https://cdn.test/products/b.jpg")
+
+        with mock.patch("catalog.serializers.delete_s3_objects") as delete_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._patch({"images": [{"url": "https://cdn.test/products/a.jpg", "is_cover": True}]})
+                delete_task.delay.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        delete_task.delay.assert_called_once_with(["products/b.jpg"])
+
+    @override_settings(AWS_S3_BUCKET=None)
+    def test_s3_is_untouched_without_a_bucket(self):
+        ProductImage.objects.create(product=self.product, url="https://cdn.test/products/a.jpg")
+
+        with mock.patch("catalog.serializers.delete_s3_objects") as delete_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._patch({"images": []})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        delete_task.delay.assert_not_called()
+
+
+class EstimatedCountPaginationKeyTests(SimpleTestCase):
+    view = SimpleNamespace(basename="product")
+
+    def _key(self, params=None, is_staff=False):
+        request = Request(APIRequestFactory().get("/api/products/", params or {}))
+        request.user = SimpleNamespace(is_staff=is_staff)
+        return EstimatedCountPagination().get_count_cache_key(request, self.view)
+
+    def test_paging_and_ordering_share_the_filter_key(self):
+        base = self._key({"category_id": "1"})
+        self.assertIsNotNone(base)
+        self.assertEqual(base, self._key({"category_id": "1", "page": "3", "ordering": "-price"}))
+
+    def test_filter_values_and_staff_split_the_key(self):
+        base = self._key({"category_id": "1"})
+        self.assertNotEqual(base, self._key({"category_id": "2"}))
+        self.assertNotEqual(base, self._key({"category_id": "1", "is_active": "true"}))
+        self.assertNotEqual(base, self._key({"category_id": "1"}, is_staff=True))
+
+    def test_other_filters_are_not_cached(self):
+        self.assertIsNone(self._key({"search": "horno"}))
+        self.assertIsNone(self._key({"category_id": "1", "ids": "a,b"}))
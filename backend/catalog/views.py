@@ -1,14 +1,11 @@
 ﻿"""ViewSets for catalog domain."""
 from __future__ import annotations
 
-from pathlib import Path
-from uuid import UUID, uuid4
+import re
 
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 from django.conf import settings
 from django.db.models import Q
-from django.utils import timezone
 from rest_framework import filters, status
 from rest_framework.permissions import BasePermission, SAFE_METHODS, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
@@ -16,8 +13,56 @@ from rest_framework.views import APIView
 
 from activity.mixins import AuditableModelViewSet
 from .models import Category, Product, Promotion
-from .promotion_service import PromotionPricingEngine
+from .pagination import ProductPagination
+from .promotion_service import active_promotion_targets
 from .serializers import CategorySerializer, ProductSerializer, PromotionSerializer
+from .storage import (
+    S3_UPLOAD_CONFIG,
+    build_object_key,
+    get_s3_client,
+    presign_image_upload,
+    public_url_for,
+    upload_acl,
+)
+
+
+_TRUTHY = frozenset({"true", "1", "yes"})
+_FALSY = frozenset({"false", "0", "no"})
+_PROMOTION_STATUS = {"active": True, "inactive": False}
+
+
+def _parse_bool(value: str | None) -> bool | None:
+    """True/False for recognised query flags, None when absent or unknown."""
+
+    if not value:
+        return None
+    value = value.lower()
+    if value in _TRUTHY:
+        return True
+    if value in _FALSY:
+        return False
+    return None
+
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}(?:-?[0-9a-fA-F]{4}){3}-?[0-9a-fA-F]{12}")
+
+
+def _parse_uuid_list(value: str) -> list[str]:
+    """Comma-separated UUIDs; raises ValueError on the first invalid token.
+
+    Tokens are only shape-checked here; the UUID field converts them once
+    when the filter is compiled.
+    """
+
+    ids = []
+    for token in value.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        if not _UUID_RE.fullmatch(token):
+            raise ValueError(token)
+        ids.append(token)
+    return ids
 
 
 class AdminOrReadOnly(BasePermission):
@@ -39,12 +84,9 @@ class CategoryViewSet(AuditableModelViewSet):
 
 
 class ProductViewSet(AuditableModelViewSet):
-    queryset = (
-        Product.objects.select_related("category")
-        .prefetch_related("images", "features")
-        .all()
-    )
+    queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    pagination_class = ProductPagination
     permission_classes = [AdminOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name", "sku"]
@@ -54,208 +96,166 @@ class ProductViewSet(AuditableModelViewSet):
 
     def get_queryset(self):
         queryset = super().get_queryset()
+        if self.action in {"list", "retrieve"}:
+            queryset = ProductSerializer.setup_eager_loading(queryset)
+        else:
+            # Writes drop any prefetched images/features before rendering and
+            # deletes never render, so only the category join is worth it.
+            queryset = queryset.select_related("category")
         request = self.request
         category_id = request.query_params.get("category_id")
         if category_id:
             queryset = queryset.filter(category_id=category_id)
-        is_active_param = request.query_params.get("is_active")
-        if is_active_param is not None and is_active_param != "":
-            if is_active_param.lower() in {"true", "1"}:
-                queryset = queryset.filter(is_active=True)
-            elif is_active_param.lower() in {"false", "0"}:
-                queryset = queryset.filter(is_active=False)
+        is_active = _parse_bool(request.query_params.get("is_active"))
+        if is_active is not None:
+            queryset = queryset.filter(is_active=is_active)
         if not request.user.is_staff:
             queryset = queryset.filter(is_active=True)
         ids_param = request.query_params.get("ids")
         if ids_param:
             try:
-                ids = [UUID(part.strip()) for part in ids_param.split(",") if part.strip()]
+                ids = _parse_uuid_list(ids_param)
+            except ValueError:
+                queryset = queryset.none()
+            else:
                 if ids:
                     queryset = queryset.filter(id__in=ids)
-            except (ValueError, AttributeError):
-                queryset = queryset.none()
-        has_promotion_param = request.query_params.get("has_promotion")
-        if has_promotion_param and has_promotion_param.lower() in {"true", "1", "yes"}:
+        if _parse_bool(request.query_params.get("has_promotion")):
             queryset = self._filter_with_active_promotions(queryset)
         return queryset
 
-    def _prepare_promotion_engine(self, items):
-        if not items:
-            self._promotion_engine = None
-            return
-        self._promotion_engine = PromotionPricingEngine(items)
-
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        if hasattr(self, "_promotion_engine") and self._promotion_engine:
-            context["promotion_pricing"] = self._promotion_engine
-        return context
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            items = list(page)
-            self._prepare_promotion_engine(items)
-            serializer = self.get_serializer(items, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        items = list(queryset)
-        self._prepare_promotion_engine(items)
-        serializer = self.get_serializer(items, many=True)
-        return Response(serializer.data)
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self._prepare_promotion_engine([instance])
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
-
     def _filter_with_active_promotions(self, queryset):
-        now = timezone.now()
-        active_promotions = (
-            Promotion.objects.filter(is_active=True)
-            .filter(Q(start_date__lte=now) | Q(start_date__isnull=True))
-            .filter(Q(end_date__gte=now) | Q(end_date__isnull=True))
-        )
-        if not active_promotions.exists():
-            return queryset.none()
-        if active_promotions.filter(scope=Promotion.Scope.GLOBAL).exists():
+        targets = active_promotion_targets()
+        if targets.has_global:
             return queryset
-        category_ids = list(
-            active_promotions.filter(scope=Promotion.Scope.CATEGORY).values_list("categories__id", flat=True)
-        )
-        product_ids = list(
-            active_promotions.filter(scope=Promotion.Scope.PRODUCT).values_list("products__id", flat=True)
-        )
         filters = Q()
-        if category_ids:
-            filters |= Q(category_id__in=category_ids)
-        if product_ids:
-            filters |= Q(id__in=product_ids)
+        if targets.category_ids:
+            filters |= Q(category_id__in=targets.category_ids)
+        if targets.product_ids:
+            filters |= Q(id__in=targets.product_ids)
         if filters:
             return queryset.filter(filters)
         return queryset.none()
 
 
-class ProductImageUploadView(APIView):
-    permission_classes = [IsAuthenticated, IsAdminUser]
+# Folder each presigned upload target writes into.
+UPLOAD_PREFIXES = {"product": "products", "category": "categories"}
 
-    def post(self, request, *args, **kwargs):
-        if not settings.AWS_S3_BUCKET:
-            return Response(
-                {"detail": "El almacenamiento S3 no esta configurado."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
 
-        upload_file = request.FILES.get("file")
-        if not upload_file:
-            return Response(
-                {"detail": "Debes adjuntar un archivo en el campo 'file'."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+def _upload_to_s3(upload_file, prefix: str) -> Response:
+    """Upload ``upload_file`` under ``prefix/`` and describe the stored object."""
 
-        content_type = upload_file.content_type or "application/octet-stream"
-        file_extension = Path(upload_file.name).suffix.lower()
-        object_key = f"products/{uuid4()}{file_extension}"
-
-        extra_args: dict[str, str] = {"ContentType": content_type}
-        acl_value = (settings.AWS_S3_UPLOAD_ACL or "").strip()
-        if acl_value and acl_value.lower() not in {"none", "default"}:
-            extra_args["ACL"] = acl_value
+    if not settings.AWS_S3_BUCKET:
+        return Response(
+            {"detail": "El almacenamiento S3 no esta configurado."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-        try:
-            s3_client = boto3.client(
-                "s3",
-                region_name=settings.AWS_REGION,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            )
-            s3_client.upload_fileobj(upload_file, settings.AWS_S3_BUCKET, object_key, ExtraArgs=extra_args)
-        except (BotoCoreError, ClientError) as upload_error:
-            return Response(
-                {
-                    "detail": "No se pudo subir la imagen al almacenamiento.",
-                    "error": str(upload_error),
-                },
-                status=status.HTTP_502_BAD_GATEWAY,
-            )
+    if not settings.AWS_S3_SERVER_UPLOADS:
+        return Response(
+            {"detail": "Usa /api/uploads/presign/ para subir imagenes directamente a S3."},
+            status=status.HTTP_410_GONE,
+        )
 
-        public_base = (settings.AWS_S3_PUBLIC_DOMAIN or "").rstrip("/")
-        public_url = f"{public_base}/{object_key}" if public_base else object_key
+    if not upload_file:
+        return Response(
+            {"detail": "Debes adjuntar un archivo en el campo 'file'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
+    content_type = upload_file.content_type or "application/octet-stream"
+    object_key = build_object_key(prefix, upload_file.name)
+
+    extra_args: dict[str, str] = {"ContentType": content_type}
+    acl_value = upload_acl()
+    if acl_value:
+        extra_args["ACL"] = acl_value
+
+    try:
+        s3_client = get_s3_client()
+        s3_client.upload_fileobj(
+            upload_file,
+            settings.AWS_S3_BUCKET,
+            object_key,
+            ExtraArgs=extra_args,
+            Config=S3_UPLOAD_CONFIG,
+        )
+    except (BotoCoreError, ClientError) as upload_error:
         return Response(
             {
-                "url": public_url,
-                "mime_type": content_type,
-                "size_bytes": upload_file.size,
-                "key": object_key,
+                "detail": "No se pudo subir la imagen al almacenamiento.",
+                "error": str(upload_error),
             },
-            status=status.HTTP_201_CREATED,
+            status=status.HTTP_502_BAD_GATEWAY,
         )
 
+    return Response(
+        {
+            "url": public_url_for(object_key),
+            "mime_type": content_type,
+            "size_bytes": upload_file.size,
+            "key": object_key,
+        },
+        status=status.HTTP_201_CREATED,
+    )
+
+
+class ProductImageUploadView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        return _upload_to_s3(request.FILES.get("file"), "products")
+
 
 class CategoryImageUploadView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def post(self, request, *args, **kwargs):
+        return _upload_to_s3(request.FILES.get("file"), "categories")
+
+
+class ImageUploadPresignView(APIView):
+    """Presigned S3 POST so image bytes never pass through the API worker."""
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
         if not settings.AWS_S3_BUCKET:
             return Response(
                 {"detail": "El almacenamiento S3 no esta configurado."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        upload_file = request.FILES.get("file")
-        if not upload_file:
+        params = request.query_params
+        filename = (params.get("filename") or "").strip()
+        content_type = (params.get("content_type") or "").strip()
+        prefix = UPLOAD_PREFIXES.get(params.get("target", "product"))
+        if not filename or not content_type.startswith("image/"):
             return Response(
-                {"detail": "Debes adjuntar un archivo en el campo 'file'."},
+                {"detail": "Indica 'filename' y un 'content_type' de imagen."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if prefix is None:
+            return Response(
+                {"detail": "El destino debe ser 'product' o 'category'."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        content_type = upload_file.content_type or "application/octet-stream"
-        file_extension = Path(upload_file.name).suffix.lower()
-        object_key = f"categories/{uuid4()}{file_extension}"
-
-        extra_args: dict[str, str] = {"ContentType": content_type}
-        acl_value = (settings.AWS_S3_UPLOAD_ACL or "").strip()
-        if acl_value and acl_value.lower() not in {"none", "default"}:
-            extra_args["ACL"] = acl_value
 
         try:
-            s3_client = boto3.client(
-                "s3",
-                region_name=settings.AWS_REGION,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            )
-            s3_client.upload_fileobj(upload_file, settings.AWS_S3_BUCKET, object_key, ExtraArgs=extra_args)
-        except (BotoCoreError, ClientError) as upload_error:
+            payload = presign_image_upload(prefix, filename, content_type)
+        except (BotoCoreError, ClientError) as presign_error:
             return Response(
                 {
-                    "detail": "No se pudo subir la imagen al almacenamiento.",
-                    "error": str(upload_error),
+                    "detail": "No se pudo preparar la subida al almacenamiento.",
+                    "error": str(presign_error),
                 },
                 status=status.HTTP_502_BAD_GATEWAY,
             )
-
-        public_base = (settings.AWS_S3_PUBLIC_DOMAIN or "").rstrip("/")
-        public_url = f"{public_base}/{object_key}" if public_base else object_key
-
-        return Response(
-            {
-                "url": public_url,
-                "mime_type": content_type,
-                "size_bytes": upload_file.size,
-                "key": object_key,
-            },
-            status=status.HTTP_201_CREATED,
-        )
+        return Response(payload)
 
 
 class PromotionViewSet(AuditableModelViewSet):
-    queryset = Promotion.objects.prefetch_related("categories", "products").all()
+    queryset = PromotionSerializer.setup_eager_loading(Promotion.objects.all())
     serializer_class = PromotionSerializer
     permission_classes = [AdminOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -270,11 +270,9 @@ class PromotionViewSet(AuditableModelViewSet):
         status_param = self.request.query_params.get("status")
         if scope:
             queryset = queryset.filter(scope=scope.upper())
-        if status_param:
-            if status_param.lower() == "active":
-                queryset = queryset.filter(is_active=True)
-            elif status_param.lower() == "inactive":
-                queryset = queryset.filter(is_active=False)
+        is_active = _PROMOTION_STATUS.get(status_param.lower()) if status_param else None
+        if is_active is not None:
+            queryset = queryset.filter(is_active=is_active)
         return queryset
 
 
@@ -39,6 +39,16 @@ class PushToken(models.Model):
         return f"{self.user.email} - {self.platform}"
 
 
+class UserNotificationQuerySet(models.QuerySet):
+    def mark_read(self, user, ids=None) -> int:
+        """Mark ``user``'s unread notifications (optionally only ``ids``) as read in one UPDATE."""
+
+        queryset = self.filter(user=user, is_read=False)
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        return queryset.update(is_read=True, read_at=timezone.now())
+
+
 class UserNotification(models.Model):
     class Category(models.TextChoices):
         SYSTEM = "SYSTEM", "Sistema"
@@ -61,6 +71,8 @@ class UserNotification(models.Model):
     read_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UserNotificationQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
@@ -1,28 +1,51 @@
 """Serializers for notifications app."""
+import uuid
+
+from django.utils import timezone
 from rest_framework import serializers
 
 from .models import PushToken, UserNotification
 
+_UPSERT_SQL = f"""
+    INSERT INTO {PushToken._meta.db_table}
+        (id, user_id, token, platform, device_name, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (token) DO UPDATE SET
+        user_id = EXCLUDED.user_id,
+        platform = EXCLUDED.platform,
+        device_name = EXCLUDED.device_name,
+        updated_at = EXCLUDED.updated_at
+    RETURNING id, user_id, token, platform, device_name, created_at, updated_at
+"""
+
 
 class PushTokenSerializer(serializers.ModelSerializer):
     class Meta:
         model = PushToken
         fields = ("id", "token", "platform", "device_name", "created_at", "updated_at")
         read_only_fields = ("id", "created_at", "updated_at")
+        # Re-registering a known token is an upsert, not a validation error.
+        extra_kwargs = {"token": {"validators": []}}
 
     def create(self, validated_data):
         user = self.context["request"].user
-        token = validated_data["token"]
-        PushToken.objects.filter(token=token).exclude(user=user).delete()
-        instance, _ = PushToken.objects.update_or_create(
-            token=token,
-            defaults={
-                "user": user,
-                "platform": validated_data.get("platform", PushToken.Platform.ANDROID),
-                "device_name": validated_data.get("device_name", ""),
-            },
-        )
-        return instance
+        now = timezone.now()
+        # One INSERT .. ON CONFLICT moves an existing token to this user. RETURNING
+        # hands back the stored row, so a re-registered token keeps its id.
+        return list(
+            PushToken.objects.raw(
+                _UPSERT_SQL,
+                [
+                    uuid.uuid4(),
+                    user.pk,
+                    validated_data["token"],
+                    validated_data.get("platform", PushToken.Platform.ANDROID),
+                    validated_data.get("device_name", ""),
+                    now,
+                    now,
+                ],
+            )
+        )[0]
 
 
 class UserNotificationSerializer(serializers.ModelSerializer):
@@ -51,3 +74,7 @@ class UserNotificationUpdateSerializer(serializers.ModelSerializer):
             instance.mark_as_read()
             return instance
         return super().update(instance, validated_data)
+
+
+class UserNotificationMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=500)
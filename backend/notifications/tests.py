@@ -0,0 +1,109 @@
+"""Notification API tests."""
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from notifications.models import PushToken, UserNotification
+
+
+class UserNotificationAPITests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="cliente@example.com", password="Cliente123!")
+        self.other = User.objects.create_user(email="otro@example.com", password="Otro123!")
+        self.client.force_authenticate(user=self.user)
+
+    def _notify(self, user, **extra):
+        return UserNotification.objects.create(user=user, title="Aviso", body="Tienes un aviso.", **extra)
+
+    def test_mark_read_updates_only_the_given_ids(self):
+        first = self._notify(self.user)
+        second = self._notify(self.user)
+        untouched = self._notify(self.user)
+
+        response = self.client.post(
+            reverse("notification-mark-read"),
+            {"ids": [str(first.id), str(second.id)]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertEqual(
+            set(UserNotification.objects.filter(is_read=True).values_list("id", flat=True)),
+            {first.id, second.id},
+        )
+        untouched.refresh_from_db()
+        self.assertFalse(untouched.is_read)
+        first.refresh_from_db()
+        self.assertIsNotNone(first.read_at)
+
+    def test_mark_read_ignores_other_users_and_read_rows(self):
+        foreign = self._notify(self.other)
+        already = self._notify(self.user, is_read=True)
+
+        response = self.client.post(
+            reverse("notification-mark-read"),
+            {"ids": [str(foreign.id), str(already.id)]},
+            format="json",
+        )
+
+        self.assertEqual(response.data, {"updated": 0})
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.is_read)
+
+    def test_mark_read_requires_ids(self):
+        response = self.client.post(reverse("notification-mark-read"), {"ids": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mark_all_read(self):
+        self._notify(self.user)
+        self._notify(self.user)
+        foreign = self._notify(self.other)
+
+        response = self.client.post(reverse("notification-mark-all-read"), format="json")
+
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertFalse(UserNotification.objects.filter(user=self.user, is_read=False).exists())
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.is_read)
+
+
+class PushTokenAPITests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="cliente@example.com", password="Cliente123!")
+        self.other = User.objects.create_user(email="otro@example.com", password="Otro123!")
+        self.url = reverse("push-token-list")
+
+    def _register(self, user, **payload):
+        self.client.force_authenticate(user=user)
+        data = {"token": "fcm-token-1", "platform": "android", "device_name": "Pixel"}
+        data.update(payload)
+        return self.client.post(self.url, data, format="json")
+
+    def test_register_creates_the_token(self):
+        response = self._register(self.user)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        token = PushToken.objects.get()
+        self.assertEqual(str(token.id), response.data["id"])
+        self.assertEqual(token.user, self.user)
+
+    def test_reregistering_keeps_the_row_and_updates_it(self):
+        first = self._register(self.user)
+        second = self._register(self.user, platform="ios", device_name="iPhone")
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED, second.data)
+        self.assertEqual(second.data["id"], first.data["id"])
+        token = PushToken.objects.get()
+        self.assertEqual((token.platform, token.device_name), ("ios", "iPhone"))
+        self.assertGreaterEqual(token.updated_at, token.created_at)
+
+    def test_token_moves_to_the_latest_user(self):
+        first = self._register(self.user)
+        second = self._register(self.other)
+
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(PushToken.objects.get().user, self.other)
@@ -1,7 +1,6 @@
 """ViewSets for push notifications."""
 import logging
 
-from django.utils import timezone
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,6 +8,7 @@ from rest_framework.response import Response
 from .models import PushToken, UserNotification
 from .serializers import (
     PushTokenSerializer,
+    UserNotificationMarkReadSerializer,
     UserNotificationSerializer,
     UserNotificationUpdateSerializer,
 )
@@ -57,10 +57,14 @@ class UserNotificationViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, vi
         response = super().partial_update(request, *args, **kwargs)
         return response
 
+    @action(detail=False, methods=["post"], url_path="mark-read")
+    def mark_read(self, request):
+        serializer = UserNotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = UserNotification.objects.mark_read(request.user, serializer.validated_data["ids"])
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["post"], url_path="mark-all-read")
     def mark_all_read(self, request):
-        updated = UserNotification.objects.filter(user=request.user, is_read=False).update(
-            is_read=True,
-            read_at=timezone.now(),
-        )
+        updated = UserNotification.objects.mark_read(request.user)
         return Response({"updated": updated}, status=status.HTTP_200_OK)
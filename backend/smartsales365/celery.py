@@ -0,0 +1,13 @@
+"""Celery application for SmartSales365 background tasks."""
+from __future__ import annotations
+
+import os
+
+from celery import Celery
+
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smartsales365.settings")
+
+app = Celery("smartsales365")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -131,6 +131,13 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Existing PBKDF2 hashes keep working and are upgraded on the next login.
+PASSWORD_HASHERS = [
+    "authx.hashers.TunedArgon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+
 LANGUAGE_CODE = "es-es"
 TIME_ZONE = "UTC"
 USE_I18N = True
@@ -141,6 +148,7 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "authx.User"
+AUTHENTICATION_BACKENDS = ["authx.backends.EmailBackend"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -216,6 +224,9 @@ AWS_S3_BUCKET = os.getenv("AWS_S3_BUCKET")
 AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")
 AWS_S3_PUBLIC_DOMAIN = os.getenv("AWS_S3_PUBLIC_DOMAIN")
 AWS_S3_UPLOAD_ACL = os.getenv("AWS_S3_UPLOAD_ACL", "public-read")
+# Keeps the multipart upload endpoints; direct browser uploads go through
+# the presigned POST endpoint.
+AWS_S3_SERVER_UPLOADS = os.getenv("AWS_S3_SERVER_UPLOADS", "true").lower() == "true"
 
 if AWS_S3_BUCKET and not AWS_S3_PUBLIC_DOMAIN:
     region_segment = f".{AWS_REGION}" if AWS_REGION else ""
@@ -231,3 +242,73 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
 FIREBASE_CLIENT_EMAIL = os.getenv("FIREBASE_CLIENT_EMAIL")
 FIREBASE_PRIVATE_KEY = os.getenv("FIREBASE_PRIVATE_KEY", "")
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "")
+
+# Promotion snapshots, cached catalog counts and the audit drop counters must
+# be shared by every web and worker process, so production points the cache
+# at Redis (by default the Celery broker when that is Redis). Without it each
+# process keeps its own LocMemCache: invalidations only reach the process
+# that made them and the others serve their copy until its TTL expires.
+CACHE_REDIS_URL = os.getenv(
+    "CACHE_REDIS_URL",
+    CELERY_BROKER_URL if CELERY_BROKER_URL.startswith(("redis://", "rediss://")) else "",
+)
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "smartsales365",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# Without a broker tasks run inline so local setups keep working without a worker.
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", str(not CELERY_BROKER_URL)).lower() == "true"
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_SERIALIZER = "json"
+CELERY_ACCEPT_CONTENT = ["json"]
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ROUTES = {
+    "activity.tasks.write_audit_log": {"queue": "audit"},
+    "activity.tasks.flush_audit_buffer": {"queue": "audit"},
+}
+CELERY_BEAT_SCHEDULE = {
+    "flush-audit-buffer": {
+        "task": "activity.tasks.flush_audit_buffer",
+        "schedule": 2.0,
+    },
+    "ensure-audit-partitions": {
+        "task": "activity.tasks.ensure_audit_partitions",
+        "schedule": 6 * 60 * 60,
+    },
+    # Picks up promotions whose start or end date passed since the last edit.
+    "refresh-product-prices": {
+        "task": "catalog.tasks.refresh_product_prices",
+        "schedule": 5 * 60,
+    },
+    "notify-ending-promotions": {
+        "task": "catalog.tasks.notify_ending_promotions",
+        "schedule": 10 * 60,
+    },
+}
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+# Redis list buffering audit events between write_audit_log and the periodic
+# flush. Shared by all audit worker processes, so the "audit" queue no longer
+# needs a single-process worker. Empty writes each event immediately.
+AUDIT_BUFFER_REDIS_URL = os.getenv("AUDIT_BUFFER_REDIS_URL", CACHE_REDIS_URL)
+# Fraction of anonymous audit events kept per event type (missing types keep everything).
+# Dropped events are counted in the default cache under "audit:dropped:<EVENT_TYPE>";
+# with Redis the stored key is "smartsales365:1:audit:dropped:<EVENT_TYPE>" and
+# activity.utils.dropped_event_counts() reads them all.
+AUDIT_SAMPLING = {
+    "SYSTEM_ERROR": 1.0,
+    "ACTION": 0.1,
+}
+AUDIT_IGNORED_PATHS = {"/healthz", "/metrics"}
@@ -20,6 +20,7 @@ from authx.views import (
 from catalog.views import (
     CategoryImageUploadView,
     CategoryViewSet,
+    ImageUploadPresignView,
     ProductImageUploadView,
     ProductViewSet,
     PromotionViewSet,
@@ -60,6 +61,7 @@ urlpatterns = [
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="docs"),
     path("api/products/upload-image/", ProductImageUploadView.as_view(), name="product-image-upload"),
     path("api/categories/upload-image/", CategoryImageUploadView.as_view(), name="category-image-upload"),
+    path("api/uploads/presign/", ImageUploadPresignView.as_view(), name="image-upload-presign"),
     path("api/stripe/webhook/", stripe_webhook, name="stripe-webhook"),
     path("api/reportes/dinamicos/", DynamicReportView.as_view(), name="dynamic-reports"),
     path("api/reportes/transcribir/", AudioTranscriptionView.as_view(), name="dynamic-reports-transcribe"),